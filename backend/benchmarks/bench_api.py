@@ -0,0 +1,388 @@
+"""
+Latency and allocation regression suite for the API hot paths.
+
+Runs the app in-process through Starlette's TestClient (lifespan included)
+against mongomock-motor, or a throwaway database on MONGO_URL with
+--mongo, seeded with the demo users and the demo patients scaled up with
+consultation and chat history. Each endpoint is timed over a few rounds
+of requests (the fastest round counts), then replayed under tracemalloc
+for the peak allocation per request. Results are compared with a JSON
+baseline and the run fails when an endpoint's median latency or
+allocations grow beyond the threshold.
+
+    python -m benchmarks.bench_api --scale 100 --rounds 5 --iterations 30
+    python -m benchmarks.bench_api --update-baseline        # record a new baseline
+    python -m benchmarks.bench_api --only chat,amr_risk
+
+Latency limits are scaled by a fixed pure-Python workload timed in the
+same rounds, which absorbs the machine being faster or slower than when
+the baseline was recorded. Settings (scale, consultations, history) must
+match the baseline's.
+
+mongomock-motor is a development dependency: install requirements-dev.txt
+(`pip install -r requirements-dev.txt`) unless running with --mongo.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "api.json")
+BENCH_DATABASE = "medikal_bench"
+PASSWORD = "demo123"
+HISTORY_SESSION = "bench-history"
+
+SYMPTOMS = [
+    "fever and headache with chills",
+    "productive cough and chest pain",
+    "diarrhea and stomach cramps",
+    "itchy skin rash on both arms",
+    "sore throat and runny nose",
+]
+MEDICATIONS = [
+    "Amoxicillin", "Ciprofloxacin", "Azithromycin", "Doxycycline", "Paracetamol",
+    "Ibuprofen", "Artemether-Lumefantrine", "ORS", "Warfarin", "Enalapril",
+]
+CHAT_MESSAGES = ["I have a fever", "Mfite umuriro", "What should I do about a headache?", "hello"]
+
+
+def scaled_patients(scale):
+    from setup_demo_data import DEMO_PATIENTS
+
+    now = datetime.utcnow()
+    patients = []
+    for copy in range(scale):
+        for i, patient in enumerate(DEMO_PATIENTS):
+            patients.append({
+                **patient,
+                "full_name": f"{patient['full_name']} {copy}",
+                "national_id": f"{patient['national_id'][:-6]}{copy * len(DEMO_PATIENTS) + i:06d}",
+                "phone": f"+250 788 {copy:03d} {i:03d}",
+                "created_at": now,
+                "updated_at": now,
+            })
+    return patients
+
+
+def scaled_consultations(patient_ids, per_patient, rng):
+    now = datetime.utcnow()
+    consultations = []
+    for patient_id in patient_ids:
+        for i in range(per_patient):
+            created_at = now - timedelta(days=rng.randint(0, 180), minutes=i)
+            consultations.append({
+                "patient_id": patient_id,
+                "doctor_id": "doctor_demo",
+                "symptoms": rng.choice(SYMPTOMS),
+                "diagnosis": "Upper Respiratory Infection",
+                "icd_code": "J06.9",
+                "medications": [
+                    {"id": f"{patient_id}-{i}-{j}", "name": name, "dosage": "500mg",
+                     "duration": "7 days", "instructions": None}
+                    for j, name in enumerate(rng.sample(MEDICATIONS, 2))
+                ],
+                "notes": None,
+                "follow_up_required": False,
+                "follow_up_date": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "version": 1,
+            })
+    return consultations
+
+
+async def seed(db, scale, consultations_per_patient, history_messages):
+    from security import get_password_hash
+    from setup_demo_data import DEMO_USERS
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    await db.users.insert_many([
+        {
+            "username": user["username"],
+            "email": user["email"],
+            "password": get_password_hash(user["password"]),
+            "role": user["role"],
+            "created_at": now,
+            "updated_at": now,
+            "is_active": True,
+        }
+        for user in DEMO_USERS
+    ])
+    result = await db.patients.insert_many(scaled_patients(scale))
+    patient_ids = [str(patient_id) for patient_id in result.inserted_ids]
+    await db.consultations.insert_many(scaled_consultations(patient_ids, consultations_per_patient, rng))
+    await db.consultations.create_index([("patient_id", 1), ("created_at", -1)])
+    await db.chat_messages.insert_many([
+        {"user_id": "patient_demo", "session_id": HISTORY_SESSION, "message": rng.choice(CHAT_MESSAGES),
+         "language": "en", "timestamp": now - timedelta(minutes=history_messages - i)}
+        for i in range(history_messages)
+    ])
+    await db.ai_responses.insert_many([
+        {"session_id": HISTORY_SESSION, "response": "Please drink plenty of water and rest.",
+         "confidence": 0.8, "timestamp": now - timedelta(minutes=history_messages - i, seconds=-1)}
+        for i in range(history_messages)
+    ])
+    return patient_ids
+
+
+def test_image():
+    from PIL import Image
+
+    image = Image.new("RGB", (256, 256), (200, 150, 120))
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    return buffered.getvalue()
+
+
+def endpoints(client, tokens, patient_ids):
+    """name -> (request callable, relative weight of the default iteration count)"""
+    doctor = {"Authorization": f"Bearer {tokens['doctor_demo']}"}
+    patient = {"Authorization": f"Bearer {tokens['patient_demo']}"}
+    image = test_image()
+    counter = iter(range(10 ** 9))
+
+    def create_consultation():
+        # Skips the first patient, whose history the read endpoints use
+        patient_id = patient_ids[1 + next(counter) % (len(patient_ids) - 1)]
+        return client.post("/api/consultations/", headers=doctor, json={
+            "patient_id": patient_id,
+            "doctor_id": "doctor_demo",
+            "symptoms": "fever and cough",
+            "diagnosis": "Malaria",
+            "medications": [
+                {"name": "Artemether-Lumefantrine", "dosage": "80/480mg", "duration": "3 days"},
+                {"name": "Ibuprofen", "dosage": "400mg", "duration": "5 days"},
+            ],
+        })
+
+    return {
+        "login": (lambda: client.post("/api/auth/login", data={"username": "doctor_demo", "password": PASSWORD}), 0.2),
+        "get_current_user": (lambda: client.get("/api/auth/me", headers=doctor), 1),
+        "patient_list": (lambda: client.get("/api/patients", headers=doctor), 1),
+        "patient_search": (lambda: client.get("/api/patients/search/Mukamana", headers=doctor), 1),
+        "consultation_create": (create_consultation, 1),
+        "consultation_list": (lambda: client.get(f"/api/consultations/patient/{patient_ids[0]}", headers=doctor), 1),
+        "diagnosis": (lambda: client.post("/api/ai/diagnosis", headers=doctor, json={
+            "symptoms": "fever, headache and chills", "patient_id": patient_ids[0],
+        }), 1),
+        "chat": (lambda: client.post("/api/ai/chat", headers=patient, json={
+            "message": "I have a fever and headache", "session_id": "bench-chat",
+        }), 1),
+        "chat_history": (lambda: client.get(f"/api/ai/chat/history/{HISTORY_SESSION}", headers=patient), 1),
+        "amr_risk": (lambda: client.get(f"/api/ai/amr/risk/{patient_ids[0]}", headers=doctor), 1),
+        "skin_analysis": (lambda: client.post("/api/ai/skin-analysis", headers=patient, files={
+            "file": ("skin.jpg", image, "image/jpeg"),
+        }), 0.2),
+    }
+
+
+def check(request, warmup=3):
+    for _ in range(warmup):
+        response = request()
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+
+def time_requests(request, iterations):
+    gc.collect()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def peak_allocations(request, iterations):
+    """Median peak traced memory per request, in every thread of this process"""
+    allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            request()
+            allocations.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return statistics.median(allocations)
+
+
+def calibration_workload():
+    """Fixed pure-Python work timed alongside the endpoints to gauge machine speed"""
+    records = [{"id": i, "name": f"patient {i}", "tags": list(range(i % 10))} for i in range(2000)]
+    json.loads(json.dumps(records))
+    sorted(records, key=lambda record: record["name"])
+
+
+def measure(requests, iterations, alloc_iterations, rounds):
+    """
+    Rounds go over every endpoint in turn and each endpoint keeps its
+    fastest round, so a slow patch on the machine doesn't land entirely
+    on one endpoint. Returns the results and the calibration time.
+    """
+    for request, _ in requests.values():
+        check(request)
+
+    best, calibration = {}, []
+    for _ in range(rounds):
+        calibration.extend(time_requests(calibration_workload, 5))
+        for name, (request, weight) in requests.items():
+            timings = time_requests(request, max(5, int(iterations * weight)))
+            if name not in best or statistics.median(timings) < statistics.median(best[name]):
+                best[name] = timings
+
+    results = {
+        name: {
+            "median_ms": round(statistics.median(best[name]), 3),
+            "p95_ms": round(best[name][min(len(best[name]) - 1, int(len(best[name]) * 0.95))], 3),
+            "alloc_kib": round(peak_allocations(request, alloc_iterations), 1),
+        }
+        for name, (request, _) in requests.items()
+    }
+    return results, round(min(calibration), 3)
+
+
+# Absolute slack on top of the relative thresholds, so sub-millisecond
+# endpoints don't fail on scheduler noise
+LATENCY_SLACK_MS = 1.0
+ALLOC_SLACK_KIB = 8.0
+
+
+def compare(results, baseline, latency_threshold, alloc_threshold, speed):
+    """`speed` scales recorded latencies to this machine's speed during the run"""
+    failures = []
+    for name, result in results.items():
+        recorded = baseline["endpoints"].get(name)
+        if recorded is None:
+            continue
+        for metric, threshold, slack in (
+            ("median_ms", latency_threshold, LATENCY_SLACK_MS),
+            ("alloc_kib", alloc_threshold, ALLOC_SLACK_KIB),
+        ):
+            recorded_value = recorded[metric] * speed if metric == "median_ms" else recorded[metric]
+            limit = recorded_value * (1 + threshold) + slack
+            if result[metric] > limit:
+                failures.append(
+                    f"{name}: {metric} {result[metric]} exceeds baseline {recorded_value:.3f} by more than {threshold:.0%}"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=100, help="copies of the demo patients")
+    parser.add_argument("--consultations", type=int, default=10, help="consultations per patient")
+    parser.add_argument("--history", type=int, default=50, help="messages in the chat history session")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=5, help="timing rounds, each endpoint keeps its fastest")
+    parser.add_argument("--alloc-iterations", type=int, default=5)
+    parser.add_argument("--only", help="comma separated endpoint names")
+    parser.add_argument("--mongo", action="store_true", help=f"use the {BENCH_DATABASE} database on MONGO_URL")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--latency-threshold", type=float,
+                        default=float(os.getenv("BENCH_LATENCY_THRESHOLD", "0.25")))
+    parser.add_argument("--alloc-threshold", type=float,
+                        default=float(os.getenv("BENCH_ALLOC_THRESHOLD", "0.20")))
+    args = parser.parse_args()
+    if args.update_baseline and args.only:
+        parser.error("--update-baseline records every endpoint, drop --only")
+
+    if not args.mongo:
+        # mongomock has no change streams and nothing else writes to it
+        os.environ.setdefault("INVALIDATION_MODE", "off")
+
+    from fastapi.testclient import TestClient
+    from database import db
+    import routes.ai
+    import server
+
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from config import MONGO_URL
+        mongo_client = AsyncIOMotorClient(MONGO_URL)
+        bench_db = mongo_client[BENCH_DATABASE]
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        mongo_client = AsyncMongoMockClient()
+        bench_db = mongo_client[BENCH_DATABASE]
+    db.use(bench_db)
+
+    # Measure the endpoints themselves, not 429s from the per-user limiter
+    routes.ai.rate_limiter.role_limits = {
+        role: {"capacity": 10 ** 9, "refill_per_second": 10 ** 9} for role in routes.ai.rate_limiter.role_limits
+    }
+
+    settings = {"scale": args.scale, "consultations": args.consultations, "history": args.history}
+    with TestClient(server.app) as client:
+        try:
+            if args.mongo:
+                client.portal.call(mongo_client.drop_database, BENCH_DATABASE)
+            patient_ids = client.portal.call(seed, bench_db, args.scale, args.consultations, args.history)
+            tokens = {
+                username: client.post(
+                    "/api/auth/login", data={"username": username, "password": PASSWORD}
+                ).json()["access_token"]
+                for username in ("doctor_demo", "patient_demo")
+            }
+            requests = endpoints(client, tokens, patient_ids)
+            if args.only:
+                requests = {name: requests[name] for name in args.only.split(",")}
+
+            print(f"{len(patient_ids)} patients, {len(patient_ids) * args.consultations} consultations, "
+                  f"{args.rounds} rounds of {args.iterations} iterations")
+            results, calibration_ms = measure(requests, args.iterations, args.alloc_iterations, args.rounds)
+            print(f"{'endpoint':<22}{'median ms':>11}{'p95 ms':>10}{'alloc KiB':>11}")
+            for name, result in results.items():
+                print(f"{name:<22}{result['median_ms']:>11.2f}{result['p95_ms']:>10.2f}{result['alloc_kib']:>11.1f}")
+        finally:
+            if args.mongo:
+                client.portal.call(mongo_client.drop_database, BENCH_DATABASE)
+    mongo_client.close()
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        baseline = {
+            "recorded_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "backend": "mongo" if args.mongo else "mongomock",
+            "settings": settings,
+            "calibration_ms": calibration_ms,
+            "endpoints": results,
+        }
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["settings"] != settings or baseline["backend"] != ("mongo" if args.mongo else "mongomock"):
+        print(f"FAIL: baseline was recorded with {baseline['backend']} {baseline['settings']}; "
+              f"rerun with the same settings or --update-baseline")
+        sys.exit(1)
+
+    speed = calibration_ms / baseline["calibration_ms"]
+    print(f"machine speed relative to the baseline: {1 / speed:.2f}x (latency limits scaled to match)")
+    failures = compare(results, baseline, args.latency_threshold, args.alloc_threshold, speed)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
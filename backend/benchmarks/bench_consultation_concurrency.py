@@ -0,0 +1,141 @@
+"""
+Concurrent writer benchmark for versioned consultation updates.
+
+Runs N writers against one consultation, half doing compare-and-set field
+updates with the version they last read and half patching medications, and
+reports throughput, conflict rate and whether any write was lost.
+
+    python -m benchmarks.bench_consultation_concurrency --writers 8 --ops 200
+    python -m benchmarks.bench_consultation_concurrency --mock   # mongomock-motor
+
+mongomock-motor completes every operation without yielding to the event
+loop, so writers could never interleave between a read and the
+compare-and-set and the conflict rate would always be 0%. With --mock
+each collection call first sleeps for a random simulated round trip of
+up to --latency-ms. mongomock-motor comes from requirements-dev.txt.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.consultation_versioning import (  # noqa: E402
+    VersionConflict,
+    patch_medications,
+    update_fields,
+)
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/medikal")
+
+
+class LatencyCollection:
+    """Wraps a mongomock-motor collection so each call yields like a network round trip"""
+
+    def __init__(self, collection, latency: float):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(random.uniform(0, self._latency))
+            result = method(*args, **kwargs)
+            return await result if asyncio.iscoroutine(result) else result
+        return call
+
+
+async def field_writer(collection, consultation_id, writer_id, ops, stats):
+    for i in range(ops):
+        consultation = await collection.find_one({"_id": consultation_id}, {"version": 1})
+        try:
+            await update_fields(
+                collection, consultation_id, {"notes": f"writer {writer_id} edit {i}"},
+                consultation.get("version", 1)
+            )
+            stats["committed"] += 1
+        except VersionConflict:
+            stats["conflicts"] += 1
+        await asyncio.sleep(0)
+
+
+async def medication_writer(collection, consultation_id, writer_id, ops, stats):
+    for i in range(ops):
+        # Unversioned patches retry internally, a conflict here means retries ran out
+        try:
+            await patch_medications(collection, consultation_id, [{
+                "op": "add",
+                "medication": {"name": f"Drug {writer_id}-{i}", "dosage": "1", "duration": "1 day"},
+            }])
+            stats["committed"] += 1
+            stats["medications_added"] += 1
+        except VersionConflict:
+            stats["conflicts"] += 1
+        await asyncio.sleep(0)
+
+
+async def run(db, writers, ops, latency=None):
+    collection = db.bench_consultations
+    if latency is not None:
+        collection = LatencyCollection(collection, latency)
+    await collection.delete_many({})
+    result = await collection.insert_one({
+        "patient_id": "bench", "doctor_id": "bench", "symptoms": "", "diagnosis": "",
+        "medications": [], "created_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+        "version": 1,
+    })
+    consultation_id = result.inserted_id
+    stats = {"committed": 0, "conflicts": 0, "medications_added": 0}
+
+    tasks = []
+    for writer_id in range(writers):
+        writer = field_writer if writer_id % 2 == 0 else medication_writer
+        tasks.append(writer(collection, consultation_id, writer_id, ops, stats))
+
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    final = await collection.find_one({"_id": consultation_id})
+    attempts = stats["committed"] + stats["conflicts"]
+    print(f"writers={writers} ops/writer={ops} elapsed={elapsed:.2f}s")
+    print(f"throughput={stats['committed'] / elapsed:.0f} commits/s")
+    print(f"conflict rate={stats['conflicts'] / attempts:.1%}")
+    print(f"final version={final['version']} (expected {1 + stats['committed']})")
+    print(f"medications={len(final['medications'])} (expected {stats['medications_added']})")
+
+    await collection.drop()
+    lost = final["version"] != 1 + stats["committed"] or len(final["medications"]) != stats["medications_added"]
+    return 1 if lost else 0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--mock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="simulated round trip per call with --mock")
+    args = parser.parse_args()
+
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(MONGO_URL)
+
+    try:
+        latency = args.latency_ms / 1000 if args.mock else None
+        sys.exit(await run(client.medikal, args.writers, args.ops, latency))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Interaction checks against large synthetic catalogues.
+
+Builds InteractionGraph tables of 10k+ drugs with a fixed number of
+interactions per drug, then times checking prescriptions (all pairs)
+against a list of active medications.
+
+    python -m benchmarks.bench_drug_interactions --drugs 10000 50000 --per-drug 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.drug_interactions import InteractionGraph  # noqa: E402
+
+SEVERITIES = ["major", "moderate", "minor"]
+
+
+def make_table(drugs, per_drug, rng):
+    names = [f"drug-{i:06d}" for i in range(drugs)]
+    interactions = [
+        {
+            "drugs": [names[i], names[rng.randrange(drugs)]],
+            "severity": rng.choice(SEVERITIES),
+            "description": "synthetic interaction",
+        }
+        for i in range(drugs)
+        for _ in range(per_drug // 2)
+    ]
+    return names, {"interactions": interactions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drugs", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--per-drug", type=int, default=20)
+    parser.add_argument("--prescription", type=int, default=8)
+    parser.add_argument("--active", type=int, default=15)
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'drugs':>8}{'pairs':>10}{'build s':>10}{'p50 µs':>10}{'p99 µs':>10}{'findings/check':>16}")
+    for size in args.drugs:
+        rng = random.Random(args.seed)
+        names, table = make_table(size, args.per_drug, rng)
+
+        start = time.perf_counter()
+        graph = InteractionGraph.from_table(table)
+        build = time.perf_counter() - start
+
+        latencies, findings = [], 0
+        for _ in range(args.checks):
+            prescription = rng.sample(names, args.prescription)
+            active = rng.sample(names, args.active)
+            start = time.perf_counter()
+            findings += len(graph.check(prescription, active))
+            latencies.append((time.perf_counter() - start) * 1e6)
+        latencies.sort()
+
+        print(f"{graph.drug_count:>8}{graph.interaction_count:>10}{build:>10.2f}"
+              f"{latencies[len(latencies) // 2]:>10.1f}{latencies[int(len(latencies) * 0.99)]:>10.1f}"
+              f"{findings / args.checks:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
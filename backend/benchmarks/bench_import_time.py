@@ -0,0 +1,85 @@
+"""
+Import-time budget for the API.
+
+Imports `server` in fresh interpreters under `python -X importtime`,
+reports the slowest modules, and fails when the median import time of
+everything except the FastAPI framework itself exceeds the budget, or
+when a module that should load lazily (PIL, Motor, passlib, NumPy, ...)
+was imported.
+
+The backend has no test suite, so this script is the enforcement: it
+exits non-zero on either failure and is meant to run as a CI step next
+to the other benchmarks, from the backend directory:
+
+    python -m benchmarks.bench_import_time --runs 5 --budget-ms 300
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use or in the lifespan warmup, never at import time
+LAZY_MODULES = ["PIL", "motor", "pymongo", "passlib", "bcrypt", "jose", "numpy"]
+
+
+def import_profile():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if cumulative_us.isdigit():
+            modules[name] = int(cumulative_us)
+    return modules
+
+
+def eagerly_imported():
+    code = f"import sys, server; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "300")))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    profiles = [import_profile() for _ in range(args.runs)]
+    totals = [profile["server"] / 1000 for profile in profiles]
+    # FastAPI (with Starlette and Pydantic) is a fixed cost we don't control
+    own = [(profile["server"] - profile.get("fastapi", 0)) / 1000 for profile in profiles]
+    median = statistics.median(own)
+
+    print(f"import server: median {statistics.median(totals):.0f}ms total, "
+          f"{median:.0f}ms excluding fastapi, over {args.runs} runs (budget {args.budget_ms:.0f}ms)")
+    last = profiles[-1]
+    first_party = [name for name in last if name.split(".")[0] in ("routes", "services", "config", "database", "security")]
+    print("first-party modules:")
+    for name in sorted(first_party, key=last.get, reverse=True)[:args.top]:
+        print(f"  {last[name] / 1000:>8.1f}ms  {name}")
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"median import time {median:.0f}ms exceeds budget {args.budget_ms:.0f}ms")
+    eager = eagerly_imported()
+    if eager:
+        failures.append(f"modules that should load lazily were imported: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Intent matching latency at catalogue sizes of thousands of intents.
+
+Builds a synthetic catalogue (several examples per intent in en/fr/rw),
+then times IntentIndex.top_k over a mix of queries.
+
+    python -m benchmarks.bench_intents --intents 1000 5000 --queries 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.intents import IntentIndex  # noqa: E402
+
+SYLLABLES = ["ka", "mu", "ri", "to", "ne", "sa", "lo", "bi", "de", "fu", "go", "ha", "ji", "pe", "vu", "zo"]
+LANGUAGES = ["en", "fr", "rw"]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_catalogue(size, rng):
+    intents = []
+    for i in range(size):
+        vocabulary = [word(rng) for _ in range(6)]
+        intents.append({
+            "id": f"intent_{i}",
+            "examples": {
+                language: [" ".join(rng.sample(vocabulary, 3)) for _ in range(3)]
+                for language in LANGUAGES
+            },
+            "responses": {"en": f"response {i}"},
+        })
+    return {"intents": intents}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intents", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'intents':>8}{'rows':>8}{'build s':>10}{'matrix MB':>11}{'p50 µs':>10}{'p99 µs':>10}{'top-1 acc':>11}")
+    for size in args.intents:
+        rng = random.Random(args.seed)
+        catalogue = make_catalogue(size, rng)
+
+        start = time.perf_counter()
+        index = IntentIndex.from_catalogue(catalogue)
+        build = time.perf_counter() - start
+
+        queries = []
+        for _ in range(args.queries):
+            intent = rng.choice(catalogue["intents"])
+            queries.append((intent["id"], rng.choice(intent["examples"][rng.choice(LANGUAGES)])))
+
+        latencies, hits = [], 0
+        for expected, text in queries:
+            start = time.perf_counter()
+            results = index.top_k(text, k=3)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            hits += results[0][0] == expected
+        latencies.sort()
+
+        matrix = index._index.matrix
+        print(f"{size:>8}{matrix.shape[0]:>8}{build:>10.2f}{matrix.nbytes / 1e6:>11.1f}"
+              f"{latencies[len(latencies) // 2]:>10.0f}{latencies[int(len(latencies) * 0.99)]:>10.0f}"
+              f"{hits / len(queries):>11.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Per-request cost of turning Mongo documents into response bodies.
+
+Compares the previous path (build each response model with validation,
+then let FastAPI dump and validate it again against `response_model`
+before rendering) with `models.documents.DocumentAdapter` dicts rendered
+by MedikalResponse. Fails when the adapter path costs more than the
+budget per document, so a regression back to double validation shows.
+
+    python -m benchmarks.bench_response_models --documents 50 --repeat 200 --budget-us 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from models.consultation import ConsultationResponse, MedicationItem  # noqa: E402
+from models.documents import DocumentAdapter  # noqa: E402
+from models.patient import PatientResponse  # noqa: E402
+from services import encoding  # noqa: E402
+
+
+def make_patients(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "full_name": f"Patient {i}",
+            "phone": "+250788000000",
+            "national_id": f"1199{i:012d}",
+            "mutual_assistance_no": None,
+            "date_of_birth": "1990-01-01",
+            "gender": "female",
+            "emergency_contact": "+250788111111",
+            "language_preference": "rw",
+            "user_id": "user_demo",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+def make_consultations(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "patient_id": str(ObjectId()),
+            "doctor_id": "doctor_demo",
+            "symptoms": "Fever and productive cough for three days, mild chest pain",
+            "diagnosis": "Upper Respiratory Infection",
+            "icd_code": "J06.9",
+            "medications": [
+                {"id": str(ObjectId()), "name": "Amoxicillin", "dosage": "500mg", "duration": "7 days",
+                 "instructions": "3 times daily after meals"},
+                {"id": str(ObjectId()), "name": "Paracetamol", "dosage": "500mg", "duration": "as needed",
+                 "instructions": None},
+            ],
+            "notes": "Review in one week if symptoms persist",
+            "follow_up_required": True,
+            "follow_up_date": now + timedelta(days=7),
+            "created_at": now - timedelta(days=i),
+            "updated_at": now,
+            "version": 1,
+        }
+        for i in range(count)
+    ]
+
+
+def validated(model, document):
+    """How the routes built responses before the document adapter"""
+    fields = {name: document[name] for name in model.model_fields if name in document}
+    fields["id"] = str(document["_id"])
+    if "medications" in fields:
+        fields["medications"] = [MedicationItem(**med) for med in fields["medications"]]
+    return model(**fields)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--budget-us", type=float, default=float(os.getenv("RESPONSE_BUDGET_US", "10")))
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    datasets = {
+        "PatientResponse": (PatientResponse, make_patients(args.documents)),
+        "ConsultationResponse": (ConsultationResponse, make_consultations(args.documents)),
+    }
+
+    print(f"{args.documents} documents, {args.repeat} repetitions (budget {args.budget_us:.0f}µs/document)")
+    print(f"{'model':<24}{'path':<28}{'µs/request':>12}{'µs/doc':>10}")
+    failures = []
+    for name, (model, documents) in datasets.items():
+        field = create_response_field(name="response", type_=List[model])
+        document_adapter = DocumentAdapter(model)
+
+        def previous():
+            content = [validated(model, document) for document in documents]
+            body = loop.run_until_complete(serialize_response(field=field, response_content=content))
+            return encoding.dumps(body)
+
+        def adapter():
+            return encoding.dumps(document_adapter.dump_many(documents))
+
+        assert encoding.orjson.loads(previous()) == encoding.orjson.loads(adapter())
+        for path, render in (("validate + response_model", previous), ("DocumentAdapter", adapter)):
+            micros = timed(render, args.repeat)
+            per_document = micros / args.documents
+            print(f"{name:<24}{path:<28}{micros:>12.1f}{per_document:>10.2f}")
+            if render is adapter and per_document > args.budget_us:
+                failures.append(f"{name} costs {per_document:.1f}µs/document, budget {args.budget_us:.0f}µs")
+
+    loop.close()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
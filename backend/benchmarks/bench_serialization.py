@@ -0,0 +1,103 @@
+"""
+Payload size and serialization CPU for typical ConsultationResponse lists.
+
+Compares what FastAPI does by default for a `response_model` route
+(validate against the model, serialize it, then JSONResponse's
+json.dumps) with the same path rendered by orjson, and with the orjson
+and MessagePack renderers in services/encoding.py on their own. Reports
+the bytes on the wire with gzip and brotli.
+
+    python -m benchmarks.bench_serialization --consultations 50 --repeat 200
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from models.consultation import ConsultationResponse, MedicationItem  # noqa: E402
+from services import encoding  # noqa: E402
+
+
+def make_consultations(count):
+    now = datetime.utcnow()
+    return [
+        ConsultationResponse(
+            id=str(ObjectId()),
+            patient_id=str(ObjectId()),
+            doctor_id="doctor_demo",
+            symptoms="Fever and productive cough for three days, mild chest pain",
+            diagnosis="Upper Respiratory Infection",
+            icd_code="J06.9",
+            medications=[
+                MedicationItem(id=str(ObjectId()), name="Amoxicillin", dosage="500mg", duration="7 days",
+                               instructions="3 times daily after meals"),
+                MedicationItem(id=str(ObjectId()), name="Paracetamol", dosage="500mg", duration="as needed"),
+            ],
+            notes="Review in one week if symptoms persist",
+            follow_up_required=True,
+            follow_up_date=now + timedelta(days=7),
+            created_at=now - timedelta(days=i),
+            version=1,
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    consultations = make_consultations(args.consultations)
+    content = [c.model_dump() for c in consultations]
+    field = create_response_field(name="response", type_=List[ConsultationResponse])
+    loop = asyncio.new_event_loop()
+
+    def validated():
+        return loop.run_until_complete(serialize_response(field=field, response_content=consultations))
+
+    renderers = {
+        "FastAPI default": lambda: json.dumps(
+            validated(), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8"),
+        "FastAPI validation + orjson": lambda: encoding.dumps(validated()),
+        "orjson": lambda: encoding.dumps(content),
+    }
+    if encoding.msgpack is not None:
+        renderers["msgpack"] = lambda: encoding.msgpack.packb(
+            content, default=encoding._msgpack_default, datetime=False
+        )
+
+    print(f"{args.consultations} consultations, {args.repeat} repetitions")
+    print(f"{'renderer':<32}{'µs/render':>12}{'raw B':>10}{'gzip B':>10}{'br B':>10}")
+    for name, render in renderers.items():
+        micros, payload = timed(render, args.repeat)
+        gzipped = len(gzip.compress(payload, compresslevel=encoding.GZIP_LEVEL))
+        brotlied = (
+            len(encoding.brotli.compress(payload, quality=encoding.BROTLI_QUALITY))
+            if encoding.brotli is not None else "-"
+        )
+        print(f"{name:<32}{micros:>12.1f}{len(payload):>10}{gzipped:>10}{brotlied:>10}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
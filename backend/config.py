@@ -0,0 +1,23 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Database
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/medikal")
+
+# Security
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+# Responses
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+
+# Cache invalidation across workers: auto, change_stream, polling or off
+INVALIDATION_MODE = os.getenv("INVALIDATION_MODE", "auto")
+
+# Load PIL, the chat intent index and the interaction table before serving
+# the first request instead of on first use
+WARMUP = os.getenv("WARMUP", "1") == "1"
@@ -0,0 +1,42 @@
+from config import MONGO_URL
+
+
+class Database:
+    """
+    Handle to the medikal database that connects on first use. Importing
+    this module is cheap: Motor is only imported when a collection is
+    actually touched, or when the app lifespan calls connect().
+    """
+
+    def __init__(self):
+        self._client = None
+        self._database = None
+
+    def connect(self, url: str = MONGO_URL):
+        if self._database is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self._client = AsyncIOMotorClient(url)
+            self._database = self._client.medikal
+        return self._database
+
+    def use(self, database):
+        """Point the handle at an existing database object, e.g. a local stand-in"""
+        self.close()
+        self._database = database
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._database = None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.connect(), name)
+
+    def __getitem__(self, name):
+        return self.connect()[name]
+
+
+db = Database()
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, fall back to NDJSON.gz
+    pa = None
+    pq = None
+
+# Database setup
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/medikal")
+
+BATCH_SIZE = 1000
+STATE_FILE = ".export_state.json"
+# updated_at is stamped by the writing worker before its write commits, so a
+# document can become visible after a later-stamped one was exported. Each
+# run re-reads this window before the watermark; documents already exported
+# with the same updated_at are skipped using the ids kept in the state file.
+EXPORT_OVERLAP = timedelta(minutes=5)
+
+# One row per (consultation, medication); consultations without medications
+# still produce a single row with empty medication columns. Hard deletes are
+# exported as a row with deleted set and only consultation_id and
+# updated_at (the deletion time) filled in. Files are upserts: downstream
+# keeps the rows with the latest updated_at per consultation_id.
+COLUMNS = [
+    "consultation_id",
+    "patient_id",
+    "doctor_id",
+    "symptoms",
+    "diagnosis",
+    "icd_code",
+    "notes",
+    "follow_up_required",
+    "follow_up_date",
+    "created_at",
+    "updated_at",
+    "medication_index",
+    "medication_name",
+    "medication_dosage",
+    "medication_duration",
+    "medication_instructions",
+    "deleted",
+]
+
+PROJECTION = {
+    "patient_id": 1,
+    "doctor_id": 1,
+    "symptoms": 1,
+    "diagnosis": 1,
+    "icd_code": 1,
+    "notes": 1,
+    "follow_up_required": 1,
+    "follow_up_date": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "medications": 1,
+}
+
+
+def flatten_consultation(consultation):
+    """Yield flat rows for a consultation document"""
+    base = {
+        "consultation_id": str(consultation["_id"]),
+        "patient_id": consultation.get("patient_id"),
+        "doctor_id": consultation.get("doctor_id"),
+        "symptoms": consultation.get("symptoms"),
+        "diagnosis": consultation.get("diagnosis"),
+        "icd_code": consultation.get("icd_code"),
+        "notes": consultation.get("notes"),
+        "follow_up_required": bool(consultation.get("follow_up_required", False)),
+        "follow_up_date": consultation.get("follow_up_date"),
+        "created_at": consultation.get("created_at"),
+        "updated_at": consultation.get("updated_at") or consultation.get("created_at"),
+        "deleted": False,
+    }
+
+    medications = consultation.get("medications") or []
+    if not medications:
+        yield {
+            **base,
+            "medication_index": None,
+            "medication_name": None,
+            "medication_dosage": None,
+            "medication_duration": None,
+            "medication_instructions": None,
+        }
+        return
+
+    for index, med in enumerate(medications):
+        yield {
+            **base,
+            "medication_index": index,
+            "medication_name": med.get("name"),
+            "medication_dosage": med.get("dosage"),
+            "medication_duration": med.get("duration"),
+            "medication_instructions": med.get("instructions"),
+        }
+
+
+def tombstone_row(tombstone):
+    row = dict.fromkeys(COLUMNS)
+    row.update(consultation_id=tombstone["id"], updated_at=tombstone["updated_at"], deleted=True)
+    return row
+
+
+class ParquetSink:
+    """Writes each batch as its own row group so memory stays bounded"""
+
+    extension = "parquet"
+
+    def __init__(self, path):
+        self.path = path
+        self.schema = pa.schema([
+            ("consultation_id", pa.string()),
+            ("patient_id", pa.string()),
+            ("doctor_id", pa.string()),
+            ("symptoms", pa.string()),
+            ("diagnosis", pa.string()),
+            ("icd_code", pa.string()),
+            ("notes", pa.string()),
+            ("follow_up_required", pa.bool_()),
+            ("follow_up_date", pa.timestamp("ms")),
+            ("created_at", pa.timestamp("ms")),
+            ("updated_at", pa.timestamp("ms")),
+            ("medication_index", pa.int32()),
+            ("medication_name", pa.string()),
+            ("medication_dosage", pa.string()),
+            ("medication_duration", pa.string()),
+            ("medication_instructions", pa.string()),
+            ("deleted", pa.bool_()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        columns = {name: [row[name] for row in rows] for name in COLUMNS}
+        self.writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class NdjsonGzipSink:
+    """Fallback sink used when pyarrow is not installed"""
+
+    extension = "ndjson.gz"
+
+    def __init__(self, path):
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self.file.write(json.dumps(row, default=_json_default, separators=(",", ":")))
+            self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def load_state(state_path):
+    """The watermark and what was exported at or after its overlap window"""
+    if not os.path.exists(state_path):
+        return None, {}
+    with open(state_path) as f:
+        state = json.load(f)
+    exported = {key: datetime.fromisoformat(value) for key, value in state.get("exported", {}).items()}
+    return datetime.fromisoformat(state["last_updated_at"]), exported
+
+
+def save_state(state_path, last_updated_at, exported):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "last_updated_at": last_updated_at.isoformat(),
+            "exported": {key: value.isoformat() for key, value in exported.items()},
+        }, f)
+    os.replace(tmp_path, state_path)
+
+
+def prune_exported(exported, window_start):
+    return {key: value for key, value in exported.items() if value and value >= window_start}
+
+
+async def export_consultations(db, output_dir, fmt="auto", since=None, exported=None, batch_size=BATCH_SIZE):
+    """
+    Stream consultations and deletions since `since`, less EXPORT_OVERLAP,
+    into a compressed columnar file. `exported` maps "consultation_id" or
+    "deleted:consultation_id" to the updated_at already exported, and
+    matching entries are skipped. Returns (path, row_count,
+    last_updated_at, exported) where exported covers the next overlap window.
+    """
+    if fmt == "auto":
+        fmt = "parquet" if pa is not None else "ndjson"
+    if fmt == "parquet" and pa is None:
+        raise RuntimeError("pyarrow is required for parquet export")
+
+    sink_cls = ParquetSink if fmt == "parquet" else NdjsonGzipSink
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(output_dir, f"consultations_{stamp}.{sink_cls.extension}")
+
+    previous, exported = exported or {}, {}
+    query = {"updated_at": {"$gte": since - EXPORT_OVERLAP}} if since else {}
+    # Tombstones expire (see services.retention), so deletions older than
+    # that are only exported if the job ran within the expiry window
+    sources = [
+        ("", db.consultations.find(query, PROJECTION), flatten_consultation),
+        ("deleted:", db.sync_tombstones.find({**query, "collection": "consultations"}),
+         lambda tombstone: [tombstone_row(tombstone)]),
+    ]
+
+    sink = sink_cls(path)
+    row_count = 0
+    last_updated_at = since
+    rows = []
+    try:
+        for prefix, cursor, to_rows in sources:
+            # consultation_id -> updated_at exported, for this source only
+            seen = {
+                key[len(prefix):]: value for key, value in previous.items()
+                if key.startswith("deleted:") == bool(prefix)
+            }
+            async for doc in cursor.sort("updated_at", 1).batch_size(batch_size):
+                consultation_id = str(doc["id"] if prefix else doc["_id"])
+                updated_at = doc.get("updated_at") or doc.get("created_at")
+                # Seen earlier in this run or in the previous run's overlap
+                if updated_at is not None and seen.get(consultation_id) == updated_at:
+                    continue
+                seen[consultation_id] = updated_at
+                rows.extend(to_rows(doc))
+                if updated_at and (last_updated_at is None or updated_at > last_updated_at):
+                    last_updated_at = updated_at
+                if len(rows) >= batch_size:
+                    sink.write(rows)
+                    row_count += len(rows)
+                    rows = []
+                    # The scan runs in updated_at order, so only the ids of the
+                    # trailing overlap window are needed, even for a full export
+                    if updated_at:
+                        seen = prune_exported(seen, updated_at - EXPORT_OVERLAP)
+            exported.update({prefix + key: value for key, value in seen.items()})
+        if rows:
+            sink.write(rows)
+            row_count += len(rows)
+    finally:
+        sink.close()
+
+    if row_count == 0:
+        os.remove(path)
+        path = None
+
+    if last_updated_at is not None:
+        exported = prune_exported(exported, last_updated_at - EXPORT_OVERLAP)
+    return path, row_count, last_updated_at, exported
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export consultations for offline analytics")
+    parser.add_argument("--output-dir", default="exports")
+    parser.add_argument("--format", choices=["auto", "parquet", "ndjson"], default="auto")
+    parser.add_argument("--full", action="store_true", help="ignore the incremental state and export everything")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    state_path = os.path.join(args.output_dir, STATE_FILE)
+    since, exported = (None, {}) if args.full else load_state(state_path)
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client.medikal
+    try:
+        print(f"🔄 Exporting consultations updated after {since or 'the beginning'}...")
+        path, row_count, last_updated_at, exported = await export_consultations(
+            db, args.output_dir, fmt=args.format, since=since, exported=exported, batch_size=args.batch_size
+        )
+        if path is None:
+            print("✅ No new consultations to export")
+            return
+        save_state(state_path, last_updated_at, exported)
+        print(f"✅ Exported {row_count} rows to {path}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
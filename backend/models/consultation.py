@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class MedicationItem(BaseModel):
+    id: Optional[str] = None
     name: str
     dosage: str
     duration: str
@@ -30,6 +31,23 @@ class ConsultationUpdate(BaseModel):
     notes: Optional[str] = None
     follow_up_required: Optional[bool] = None
     follow_up_date: Optional[datetime] = None
+    version: Optional[int] = None  # expected version for compare-and-set
+
+class MedicationChanges(BaseModel):
+    name: Optional[str] = None
+    dosage: Optional[str] = None
+    duration: Optional[str] = None
+    instructions: Optional[str] = None
+
+class MedicationOperation(BaseModel):
+    op: Literal["add", "remove", "modify"]
+    id: Optional[str] = None  # required for remove and modify
+    medication: Optional[MedicationItem] = None  # required for add
+    changes: Optional[MedicationChanges] = None  # required for modify
+
+class MedicationPatch(BaseModel):
+    operations: List[MedicationOperation]
+    version: Optional[int] = None
 
 class ConsultationResponse(BaseModel):
     id: str
@@ -42,4 +60,5 @@ class ConsultationResponse(BaseModel):
     notes: Optional[str] = None
     follow_up_required: bool = False
     follow_up_date: Optional[datetime] = None
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+    version: int = 1
\ No newline at end of file
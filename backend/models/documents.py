@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional, Type, Union, get_args, get_origin
+from pydantic import BaseModel
+
+def _nested_model(annotation) -> Optional[Type[BaseModel]]:
+    """The model in `Model`, `List[Model]` or `Optional` of either, else None"""
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if get_origin(annotation) is list:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+class DocumentAdapter:
+    """
+    Maps stored Mongo documents onto the shape of a response model without
+    validating them again. Documents are validated on the way in, so reads
+    only pick the model's fields (`_id` becomes `id`), fill in defaults and
+    hand plain dicts to MedikalResponse. The per-field plan is worked out
+    once here rather than on every document.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.projection: Dict[str, int] = {name: 1 for name in model.model_fields if name != "id"}
+        self._has_id = "id" in model.model_fields
+        self._fields = []
+        for name, field in model.model_fields.items():
+            if name == "id":
+                continue
+            nested = _nested_model(field.annotation)
+            self._fields.append((
+                name,
+                field.is_required(),
+                field.get_default(call_default_factory=False),
+                DocumentAdapter(nested) if nested is not None else None,
+            ))
+
+    def dump(self, document: dict) -> dict:
+        result = {"id": str(document["_id"]) if "_id" in document else document.get("id")} if self._has_id else {}
+        for name, required, default, nested in self._fields:
+            if name in document:
+                value = document[name]
+            elif required:
+                raise KeyError(name)
+            else:
+                value = default() if callable(default) else default
+                if isinstance(value, list):
+                    value = list(value)
+            if nested is not None and value is not None:
+                value = [nested.dump(item) for item in value] if isinstance(value, list) else nested.dump(value)
+            result[name] = value
+        return result
+
+    def dump_many(self, documents: List[dict]) -> List[dict]:
+        return [self.dump(document) for document in documents]
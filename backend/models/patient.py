@@ -29,6 +29,7 @@ class PatientResponse(BaseModel):
     national_id: str
     date_of_birth: str
     gender: str
+    emergency_contact: str
     created_at: datetime
     mutual_assistance_no: Optional[str] = None
     language_preference: str = "en"
\ No newline at end of file
@@ -23,6 +23,10 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
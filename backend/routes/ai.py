@@ -1,15 +1,59 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
 from typing import List, Dict, Any
 from datetime import datetime
+from bson import ObjectId
 from pydantic import BaseModel
-from server import db, get_current_user
-import base64
-import io
-from PIL import Image
+from database import db
+from security import get_current_user
+from routes.consultation import active_medication_names
+from services.drug_interactions import format_warning, get_interaction_graph
+from services.jobs import JobQueue, LocalBroker, MongoBroker
+from services.skin_analysis import analyze_image
+from services.rate_limit import (
+    InMemoryRateLimitBackend,
+    MongoRateLimitBackend,
+    RateLimiter,
+    RateLimitExceeded,
+    retry_after_header,
+)
+import os
 import json
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
+# Rate limiting: "memory" keeps buckets per worker, "mongo" shares them across workers
+if os.getenv("RATE_LIMIT_BACKEND", "memory") == "mongo":
+    rate_limiter = RateLimiter(MongoRateLimitBackend(db, "rate_limits"))
+else:
+    rate_limiter = RateLimiter(InMemoryRateLimitBackend())
+
+# Chat intents, built on first use and reloaded when the catalogue file changes
+CHAT_INTENTS_PATH = os.getenv(
+    "CHAT_INTENTS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "chat_intents.json")
+)
+_intent_index = None
+
+def get_intent_index():
+    global _intent_index
+    if _intent_index is None:
+        from services.intents import IntentIndex
+        _intent_index = IntentIndex(CHAT_INTENTS_PATH)
+    return _intent_index
+
+def rate_limited(endpoint: str):
+    async def dependency(current_user: dict = Depends(get_current_user)):
+        try:
+            await rate_limiter.check(current_user, endpoint)
+        except RateLimitExceeded as e:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": retry_after_header(e.retry_after)},
+            )
+        return current_user
+    return dependency
+
 class DiagnosisRequest(BaseModel):
     symptoms: str
     patient_id: str
@@ -36,10 +80,49 @@ class SkinAnalysisResponse(BaseModel):
     confidence: float
     recommendation: str
 
+AMR_ANTIBIOTICS = ["Amoxicillin", "Ciprofloxacin", "Azithromycin", "Ceftriaxone", "Doxycycline"]
+AMR_HISTORY_LIMIT = 50
+
+def summarize_amr_risk(patient_id: str, consultations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    AMR risk assessment from already fetched consultations
+    """
+    antibiotic_courses = []
+    for consultation in consultations:
+        for med in consultation.get("medications", []):
+            if med.get("name") in AMR_ANTIBIOTICS:
+                antibiotic_courses.append({
+                    "antibiotic": med["name"],
+                    "date": consultation["created_at"],
+                    "duration": med.get("duration", "unknown")
+                })
+    
+    # Calculate risk score
+    risk_score = min(len(antibiotic_courses) * 15, 100)
+    
+    risk_level = "Low"
+    if risk_score >= 50:
+        risk_level = "High"
+    elif risk_score >= 30:
+        risk_level = "Medium"
+    
+    return {
+        "patient_id": patient_id,
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "antibiotic_courses": antibiotic_courses,
+        "recommendations": [
+            "Consider culture and sensitivity testing before prescribing antibiotics",
+            "Use narrow-spectrum antibiotics when possible",
+            "Ensure appropriate duration of treatment",
+            "Monitor for resistance patterns"
+        ] if risk_score >= 30 else ["Continue standard antibiotic stewardship practices"]
+    }
+
 @router.post("/diagnosis", response_model=DiagnosisResponse)
 async def get_diagnosis_suggestions(
     request: DiagnosisRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("diagnosis"))
 ):
     """
     AI-powered diagnosis suggestions based on symptoms
@@ -95,10 +178,14 @@ async def get_diagnosis_suggestions(
                 {"name": "Symptomatic Treatment", "dosage": "as appropriate", "frequency": "as needed", "duration": "as needed"}
             ]
         
+        # One read of recent history serves both the AMR and the interaction checks
+        patient_consultations = await db.consultations.find(
+            {"patient_id": request.patient_id}, {"medications": 1, "created_at": 1}
+        ).sort("created_at", -1).to_list(length=10)
+        
         # Check for AMR warnings
         if any(med["name"] in ["Amoxicillin", "Ciprofloxacin", "Azithromycin"] for med in medications):
             # Check patient's antibiotic history
-            patient_consultations = await db.consultations.find({"patient_id": request.patient_id}).to_list(length=10)
             antibiotic_count = 0
             for consultation in patient_consultations:
                 for med in consultation.get("medications", []):
@@ -108,6 +195,13 @@ async def get_diagnosis_suggestions(
             if antibiotic_count >= 3:
                 warnings.append("Patient has received multiple antibiotic courses recently. Consider culture test.")
         
+        # Check suggested medications against each other and what the patient already takes
+        interactions = get_interaction_graph().check(
+            [med["name"] for med in medications],
+            active_medication_names(patient_consultations)
+        )
+        warnings.extend(format_warning(finding) for finding in interactions)
+        
         return DiagnosisResponse(
             suggestions=suggestions,
             medications=medications,
@@ -121,7 +215,7 @@ async def get_diagnosis_suggestions(
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     message: ChatMessage,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("chat"))
 ):
     """
     Chat with AI assistant
@@ -137,49 +231,11 @@ async def chat_with_ai(
         }
         await db.chat_messages.insert_one(chat_doc)
         
-        # Generate response based on message content
-        message_lower = message.message.lower()
-        
-        if "drug interaction" in message_lower or "medication" in message_lower:
-            response = """I can help you check for drug interactions. Please provide the specific medications you'd like me to analyze. I'll check for:
-
-• Contraindications
-• Dosage conflicts  
-• Side effect interactions
-• Alternative medications
-
-Please list the medications separated by commas."""
-            
-        elif "diabetes" in message_lower:
-            response = """For diabetes management, current guidelines recommend:
-
-• **HbA1c target**: <7% for most adults
-• **Blood pressure**: <140/90 mmHg  
-• **Lifestyle modifications**: Diet and exercise
-• **Medication**: Metformin as first-line therapy
-
-Would you like more specific information about any of these areas?"""
-            
-        elif "hypertension" in message_lower:
-            response = """For hypertension management:
-
-• **Target BP**: <140/90 mmHg for most adults
-• **Lifestyle**: Low sodium diet, regular exercise
-• **First-line medications**: ACE inhibitors, ARBs, thiazide diuretics
-• **Monitoring**: Regular BP checks and medication adjustments
-
-Need specific medication recommendations?"""
-            
-        elif "fever" in message_lower or "temperature" in message_lower:
-            response = """For fever management:
-
-• **Adults**: Paracetamol 500-1000mg every 4-6 hours (max 4g/day)
-• **Children**: Paracetamol 10-15mg/kg every 4-6 hours
-• **Alternative**: Ibuprofen 400mg every 6-8 hours
-• **Non-medication**: Cool baths, adequate hydration
-
-Monitor for warning signs: difficulty breathing, severe headache, persistent vomiting."""
-            
+        # Match the message against the intent catalogue in any supported language
+        intent_index = get_intent_index()
+        intent = intent_index.match(message.message)
+        if intent is not None:
+            response = intent_index.response(intent[0], message.language)
         else:
             response = f"""I'm here to help with medical questions. Based on your message, I can provide guidance on:
 
@@ -209,68 +265,141 @@ For "{message.message}", would you like me to provide more specific information
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
-@router.post("/skin-analysis", response_model=SkinAnalysisResponse)
-async def analyze_skin_image(
+async def store_skin_analysis(job: dict, analysis: dict) -> dict:
+    """Persist a finished analysis; the job keeps everything but the image"""
+    analysis_doc = {
+        "user_id": job["user_id"],
+        "image_base64": analysis["image_base64"],
+        "predictions": analysis["predictions"],
+        "confidence": analysis["confidence"],
+        "recommendation": analysis["recommendation"],
+        "timestamp": datetime.utcnow()
+    }
+    result = await db.skin_analyses.insert_one(analysis_doc)
+    return {
+        "analysis_id": str(result.inserted_id),
+        "predictions": analysis["predictions"],
+        "confidence": analysis["confidence"],
+        "recommendation": analysis["recommendation"]
+    }
+
+# Skin analysis runs on a bounded worker pool; JOB_BROKER=mongo lets any node pick up jobs
+skin_analysis_jobs = JobQueue(
+    db,
+    "analysis_jobs",
+    process=analyze_image,
+    on_success=store_skin_analysis,
+    broker=MongoBroker(db, "analysis_jobs") if os.getenv("JOB_BROKER", "local") == "mongo" else LocalBroker(),
+    workers=int(os.getenv("SKIN_ANALYSIS_WORKERS", "2")),
+    executor=os.getenv("SKIN_ANALYSIS_EXECUTOR", "process")
+)
+SKIN_ANALYSIS_TIMEOUT_SECONDS = 60
+MAX_JOB_WAIT_SECONDS = 30
+# The token bucket limits how often a user submits; this limits how many of
+# their analyses hold pool workers at once, across all API workers
+MAX_ACTIVE_SKIN_ANALYSES = int(os.getenv("MAX_ACTIVE_SKIN_ANALYSES", "2"))
+ACTIVE_SKIN_ANALYSES_RETRY_SECONDS = 5
+
+async def submit_skin_analysis_job(file: UploadFile, current_user: dict) -> str:
+    user_id = str(current_user["_id"])
+    if await skin_analysis_jobs.active_jobs(user_id=user_id) >= MAX_ACTIVE_SKIN_ANALYSES:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many skin analyses in progress",
+            headers={"Retry-After": retry_after_header(ACTIVE_SKIN_ANALYSES_RETRY_SECONDS)},
+        )
+    return await skin_analysis_jobs.submit(
+        await file.read(),
+        type="skin_analysis",
+        user_id=user_id,
+        filename=file.filename
+    )
+
+def serialize_job(job: dict) -> dict:
+    return {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "processing_ms": job.get("processing_ms"),
+        "result": job.get("result"),
+        "error": job.get("error")
+    }
+
+@router.post("/skin-analysis/jobs", status_code=202)
+async def submit_skin_analysis(
     file: UploadFile = File(...),
+    current_user: dict = Depends(rate_limited("skin-analysis"))
+):
+    """
+    Queue a skin image for analysis and return the job id immediately
+    """
+    job_id = await submit_skin_analysis_job(file, current_user)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/skin-analysis/jobs/{job_id}")
+async def get_skin_analysis_job(
+    job_id: str,
+    wait: float = 0,
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Analyze skin image for disease detection
+    Job status and result. With `wait` the request is held open (up to 30s)
+    until the job finishes.
     """
     try:
-        # Read and process image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to base64 for storage
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
-        image_base64 = base64.b64encode(buffered.getvalue()).decode()
-        
-        # Mock AI analysis (in real implementation, this would call a trained model)
-        predictions = [
-            {"condition": "Eczema", "probability": 0.85, "severity": "mild"},
-            {"condition": "Dermatitis", "probability": 0.12, "severity": "mild"},
-            {"condition": "Normal skin", "probability": 0.03, "severity": "none"}
-        ]
-        
-        recommendation = """Based on the analysis, this appears to be eczema with mild severity. 
+        ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+    
+    if wait > 0:
+        job = await skin_analysis_jobs.wait(job_id, min(wait, MAX_JOB_WAIT_SECONDS))
+    else:
+        job = await skin_analysis_jobs.get(job_id)
+    if not job or job.get("user_id") != str(current_user["_id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
 
-**Recommendations:**
-• Apply moisturizer regularly
-• Use mild, fragrance-free soap
-• Avoid known triggers
-• Consider topical corticosteroid if symptoms persist
+@router.get("/metrics/jobs")
+async def get_job_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    Skin analysis queue depth and processing times
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return await skin_analysis_jobs.metrics()
 
-**When to see a doctor:**
-• Symptoms worsen or don't improve in 1-2 weeks
-• Signs of infection (pus, increased redness, warmth)
-• Severe itching affecting sleep"""
-        
-        # Store analysis result
-        analysis_doc = {
-            "user_id": str(current_user["_id"]),
-            "image_base64": image_base64,
-            "predictions": predictions,
-            "confidence": 0.85,
-            "recommendation": recommendation,
-            "timestamp": datetime.utcnow()
-        }
-        await db.skin_analyses.insert_one(analysis_doc)
-        
-        return SkinAnalysisResponse(
-            predictions=predictions,
-            confidence=0.85,
-            recommendation=recommendation
+@router.post("/skin-analysis", response_model=SkinAnalysisResponse)
+async def analyze_skin_image(
+    file: UploadFile = File(...),
+    current_user: dict = Depends(rate_limited("skin-analysis"))
+):
+    """
+    Analyze skin image for disease detection. Kept for clients that expect
+    the result in the same request; the work still runs on the job pool.
+    """
+    job_id = await submit_skin_analysis_job(file, current_user)
+    job = await skin_analysis_jobs.wait(job_id, SKIN_ANALYSIS_TIMEOUT_SECONDS)
+    
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Error analyzing image: {job.get('error')}")
+    if job["status"] != "succeeded":
+        raise HTTPException(
+            status_code=504,
+            detail={"message": "Analysis is still running", "job_id": job_id}
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error analyzing image: {str(e)}")
+    
+    return SkinAnalysisResponse(
+        predictions=job["result"]["predictions"],
+        confidence=job["result"]["confidence"],
+        recommendation=job["result"]["recommendation"]
+    )
 
 @router.get("/chat/history/{session_id}")
 async def get_chat_history(
     session_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("chat-history"))
 ):
     """
     Get chat history for a session
@@ -305,46 +434,27 @@ async def get_chat_history(
 @router.get("/amr/risk/{patient_id}")
 async def get_amr_risk(
     patient_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limited("amr-risk"))
 ):
     """
     Get AMR risk assessment for a patient
     """
     try:
         # Get patient's consultation history
-        consultations = await db.consultations.find({"patient_id": patient_id}).to_list(length=50)
-        
-        antibiotic_courses = []
-        for consultation in consultations:
-            for med in consultation.get("medications", []):
-                if med.get("name") in ["Amoxicillin", "Ciprofloxacin", "Azithromycin", "Ceftriaxone", "Doxycycline"]:
-                    antibiotic_courses.append({
-                        "antibiotic": med["name"],
-                        "date": consultation["created_at"],
-                        "duration": med.get("duration", "unknown")
-                    })
-        
-        # Calculate risk score
-        risk_score = min(len(antibiotic_courses) * 15, 100)
-        
-        risk_level = "Low"
-        if risk_score >= 50:
-            risk_level = "High"
-        elif risk_score >= 30:
-            risk_level = "Medium"
+        consultations = await db.consultations.find(
+            {"patient_id": patient_id}, {"medications": 1, "created_at": 1}
+        ).to_list(length=AMR_HISTORY_LIMIT)
         
-        return {
-            "patient_id": patient_id,
-            "risk_score": risk_score,
-            "risk_level": risk_level,
-            "antibiotic_courses": antibiotic_courses,
-            "recommendations": [
-                "Consider culture and sensitivity testing before prescribing antibiotics",
-                "Use narrow-spectrum antibiotics when possible",
-                "Ensure appropriate duration of treatment",
-                "Monitor for resistance patterns"
-            ] if risk_score >= 30 else ["Continue standard antibiotic stewardship practices"]
-        }
+        return summarize_amr_risk(patient_id, consultations)
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calculating AMR risk: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error calculating AMR risk: {str(e)}")
+
+@router.get("/metrics/rate-limit")
+async def get_rate_limit_metrics(current_user: dict = Depends(get_current_user)):
+    """
+    Rate limiter counters for this worker
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return rate_limiter.metrics()
\ No newline at end of file
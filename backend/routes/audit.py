@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+from database import db
+from security import get_current_user
+from services.audit import AuditWriter, query_audit_log
+
+router = APIRouter(prefix="/api/audit", tags=["audit"])
+
+# Shared by every route that mutates patients or consultations
+audit_writer = AuditWriter(db)
+
+DEFAULT_AUDIT_WINDOW_DAYS = 90
+MAX_AUDIT_ENTRIES = 1000
+
+def as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; `?since=...Z` parses as aware"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def serialize_entry(entry: dict) -> dict:
+    entry["id"] = str(entry.pop("_id"))
+    return entry
+
+@router.get("/")
+async def get_audit_log(
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    actor_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Audit entries newest first, filtered by entity and/or actor
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    until = as_naive_utc(until) or datetime.utcnow()
+    since = as_naive_utc(since) or until - timedelta(days=DEFAULT_AUDIT_WINDOW_DAYS)
+    if since > until:
+        raise HTTPException(status_code=400, detail="'since' must be before 'until'")
+    
+    # Include entries still waiting in the buffer
+    await audit_writer.flush()
+    entries = await query_audit_log(
+        db, since, until,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        actor_id=actor_id,
+        limit=min(limit, MAX_AUDIT_ENTRIES)
+    )
+    return {"entries": [serialize_entry(entry) for entry in entries]}
+
+@router.get("/metrics")
+async def get_audit_metrics(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return audit_writer.metrics()
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.security import OAuth2PasswordRequestForm
+from datetime import datetime, timedelta
+from config import ACCESS_TOKEN_EXPIRE_MINUTES
+from database import db
+from models.documents import DocumentAdapter
+from models.user import Token, UserCreate, UserResponse
+from security import get_current_user, verify_password, get_password_hash, create_access_token
+from services.encoding import MedikalResponse
+
+router = APIRouter(prefix="/api/auth", tags=["auth"])
+
+USER_DOCUMENT = DocumentAdapter(UserResponse)
+
+@router.post("/register", response_model=dict)
+async def register(user: UserCreate):
+    # Check if user exists
+    existing_user = await db.users.find_one({"username": user.username})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Username already registered")
+    
+    existing_email = await db.users.find_one({"email": user.email})
+    if existing_email:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    # Create new user
+    hashed_password = get_password_hash(user.password)
+    user_doc = {
+        "username": user.username,
+        "email": user.email,
+        "password": hashed_password,
+        "role": user.role,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        "is_active": True
+    }
+    
+    result = await db.users.insert_one(user_doc)
+    return {"message": "User created successfully", "user_id": str(result.inserted_id)}
+
+@router.post("/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await db.users.find_one({"username": form_data.username})
+    if not user or not verify_password(form_data.password, user["password"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user["username"]}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/me", response_model=UserResponse)
+async def get_current_user_info(current_user: dict = Depends(get_current_user)):
+    return MedikalResponse(USER_DOCUMENT.dump(current_user))
@@ -1,24 +1,81 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
-from datetime import datetime
+from typing import List, Set
+from datetime import datetime, timedelta
 from bson import ObjectId
-from models.consultation import ConsultationCreate, ConsultationResponse, ConsultationUpdate, MedicationItem
-from server import db, get_current_user
+from models.consultation import ConsultationCreate, ConsultationResponse, ConsultationUpdate, MedicationItem, MedicationPatch
+from database import db
+from models.documents import DocumentAdapter
+from security import get_current_user
+from routes.audit import audit_writer
+from services.encoding import MedikalResponse
+from services.drug_interactions import format_warning, get_interaction_graph
+from services.tombstones import write_tombstone
+from services.consultation_versioning import (
+    INITIAL_VERSION,
+    ConsultationNotFound,
+    MedicationNotFound,
+    VersionConflict,
+    patch_medications,
+    update_fields,
+    with_medication_ids,
+)
 
 router = APIRouter(prefix="/api/consultations", tags=["consultations"])
 
+# Medications prescribed within this window count as still being taken
+ACTIVE_MEDICATION_DAYS = 30
+
+CONSULTATION_DOCUMENT = DocumentAdapter(ConsultationResponse)
+
+def consultation_to_response(consultation: dict) -> dict:
+    return CONSULTATION_DOCUMENT.dump(consultation)
+
+async def existing_patient_ids(patient_ids: List[str]) -> Set[str]:
+    """Those of the given ids that belong to a patient; malformed ids never do"""
+    object_ids = [ObjectId(patient_id) for patient_id in patient_ids if ObjectId.is_valid(patient_id)]
+    return {str(doc["_id"]) async for doc in db.patients.find({"_id": {"$in": object_ids}}, {"_id": 1})}
+
+async def prescription_interactions(patient_id: str, medication_names: List[str]) -> List[dict]:
+    """Check a new prescription against itself and the patient's active medications"""
+    recent_consultations = await db.consultations.find(
+        {
+            "patient_id": patient_id,
+            "created_at": {"$gte": datetime.utcnow() - timedelta(days=ACTIVE_MEDICATION_DAYS)}
+        },
+        {"medications": 1, "created_at": 1}
+    ).to_list(length=None)
+    return get_interaction_graph().check(medication_names, active_medication_names(recent_consultations))
+
+async def mark_last_consultation(patient_ids: List[str], at: datetime):
+    await db.patients.update_many(
+        {"_id": {"$in": [ObjectId(patient_id) for patient_id in patient_ids]}},
+        {"$set": {"last_consultation": at, "updated_at": at}}
+    )
+
+def active_medication_names(consultations: List[dict]) -> List[str]:
+    since = datetime.utcnow() - timedelta(days=ACTIVE_MEDICATION_DAYS)
+    return [
+        med["name"]
+        for consultation in consultations
+        if consultation.get("created_at") and consultation["created_at"] >= since
+        for med in consultation.get("medications", [])
+        if med.get("name")
+    ]
+
 @router.post("/", response_model=dict)
 async def create_consultation(
     consultation: ConsultationCreate,
     current_user: dict = Depends(get_current_user)
 ):
     # Verify patient exists
-    try:
-        patient = await db.patients.find_one({"_id": ObjectId(consultation.patient_id)})
-        if not patient:
-            raise HTTPException(status_code=404, detail="Patient not found")
-    except:
+    if not ObjectId.is_valid(consultation.patient_id):
         raise HTTPException(status_code=400, detail="Invalid patient ID")
+    if not await existing_patient_ids([consultation.patient_id]):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    interactions = await prescription_interactions(
+        consultation.patient_id, [med.name for med in consultation.medications]
+    )
     
     # Create consultation document
     consultation_doc = {
@@ -27,23 +84,27 @@ async def create_consultation(
         "symptoms": consultation.symptoms,
         "diagnosis": consultation.diagnosis,
         "icd_code": consultation.icd_code,
-        "medications": [med.dict() for med in consultation.medications],
+        "medications": with_medication_ids([med.dict() for med in consultation.medications]),
         "notes": consultation.notes,
         "follow_up_required": consultation.follow_up_required,
         "follow_up_date": consultation.follow_up_date,
         "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "updated_at": datetime.utcnow(),
+        "version": INITIAL_VERSION
     }
     
     result = await db.consultations.insert_one(consultation_doc)
+    await audit_writer.record("create", "consultation", str(result.inserted_id), current_user, after=consultation_doc)
     
     # Update patient's last consultation
-    await db.patients.update_one(
-        {"_id": ObjectId(consultation.patient_id)},
-        {"$set": {"last_consultation": datetime.utcnow()}}
-    )
+    await mark_last_consultation([consultation.patient_id], datetime.utcnow())
     
-    return {"message": "Consultation created successfully", "consultation_id": str(result.inserted_id)}
+    return {
+        "message": "Consultation created successfully",
+        "consultation_id": str(result.inserted_id),
+        "warnings": [format_warning(finding) for finding in interactions],
+        "interactions": interactions
+    }
 
 @router.get("/patient/{patient_id}", response_model=List[ConsultationResponse])
 async def get_patient_consultations(
@@ -51,22 +112,10 @@ async def get_patient_consultations(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        consultations = []
-        async for consultation in db.consultations.find({"patient_id": patient_id}).sort("created_at", -1):
-            consultations.append(ConsultationResponse(
-                id=str(consultation["_id"]),
-                patient_id=consultation["patient_id"],
-                doctor_id=consultation["doctor_id"],
-                symptoms=consultation["symptoms"],
-                diagnosis=consultation["diagnosis"],
-                icd_code=consultation.get("icd_code"),
-                medications=[MedicationItem(**med) for med in consultation.get("medications", [])],
-                notes=consultation.get("notes"),
-                follow_up_required=consultation.get("follow_up_required", False),
-                follow_up_date=consultation.get("follow_up_date"),
-                created_at=consultation["created_at"]
-            ))
-        return consultations
+        consultations = await db.consultations.find(
+            {"patient_id": patient_id}, CONSULTATION_DOCUMENT.projection
+        ).sort("created_at", -1).to_list(length=None)
+        return MedikalResponse(CONSULTATION_DOCUMENT.dump_many(consultations))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error retrieving consultations: {str(e)}")
 
@@ -76,23 +125,11 @@ async def get_consultation(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        consultation = await db.consultations.find_one({"_id": ObjectId(consultation_id)})
+        consultation = await db.consultations.find_one({"_id": ObjectId(consultation_id)}, CONSULTATION_DOCUMENT.projection)
         if not consultation:
             raise HTTPException(status_code=404, detail="Consultation not found")
         
-        return ConsultationResponse(
-            id=str(consultation["_id"]),
-            patient_id=consultation["patient_id"],
-            doctor_id=consultation["doctor_id"],
-            symptoms=consultation["symptoms"],
-            diagnosis=consultation["diagnosis"],
-            icd_code=consultation.get("icd_code"),
-            medications=[MedicationItem(**med) for med in consultation.get("medications", [])],
-            notes=consultation.get("notes"),
-            follow_up_required=consultation.get("follow_up_required", False),
-            follow_up_date=consultation.get("follow_up_date"),
-            created_at=consultation["created_at"]
-        )
+        return MedikalResponse(consultation_to_response(consultation))
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid consultation ID")
 
@@ -103,59 +140,103 @@ async def update_consultation(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        update_data = {k: v for k, v in consultation_update.dict().items() if v is not None}
-        if "medications" in update_data:
-            update_data["medications"] = [med.dict() for med in update_data["medications"]]
-        
-        update_data["updated_at"] = datetime.utcnow()
-        
-        result = await db.consultations.update_one(
-            {"_id": ObjectId(consultation_id)},
-            {"$set": update_data}
+        consultation_oid = ObjectId(consultation_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid consultation ID")
+
+    update_data = {k: v for k, v in consultation_update.dict(exclude={"version"}).items() if v is not None}
+    try:
+        version, before = await update_fields(db.consultations, consultation_oid, update_data, consultation_update.version)
+    except ConsultationNotFound:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Consultation was modified by someone else", "current_version": e.current_version}
         )
-        
-        if result.matched_count == 0:
-            raise HTTPException(status_code=404, detail="Consultation not found")
-        
-        return {"message": "Consultation updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error updating consultation: {str(e)}")
 
+    await audit_writer.record("update", "consultation", consultation_id, current_user, before=before, after=update_data)
+    
+    return {"message": "Consultation updated successfully", "version": version}
+
+@router.patch("/{consultation_id}/medications", response_model=dict)
+async def patch_consultation_medications(
+    consultation_id: str,
+    patch: MedicationPatch,
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        consultation_oid = ObjectId(consultation_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid consultation ID")
+
+    for operation in patch.operations:
+        if operation.op == "add" and operation.medication is None:
+            raise HTTPException(status_code=400, detail="'add' requires a medication")
+        if operation.op in ("remove", "modify") and not operation.id:
+            raise HTTPException(status_code=400, detail=f"'{operation.op}' requires a medication id")
+        if operation.op == "modify" and operation.changes is None:
+            raise HTTPException(status_code=400, detail="'modify' requires changes")
+
+    try:
+        result = await patch_medications(
+            db.consultations,
+            consultation_oid,
+            [operation.dict() for operation in patch.operations],
+            patch.version
+        )
+    except ConsultationNotFound:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    except MedicationNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Medication {e.medication_id} not found")
+    except VersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Consultation was modified by someone else", "current_version": e.current_version}
+        )
+
+    await audit_writer.record(
+        "update", "consultation", consultation_id, current_user,
+        before={"medications": result["previous_medications"]},
+        after={"medications": result["medications"]}
+    )
+    
+    return {
+        "message": "Medications updated successfully",
+        "version": result["version"],
+        "medications": [MedicationItem(**med) for med in result["medications"]]
+    }
+
 @router.delete("/{consultation_id}")
 async def delete_consultation(
     consultation_id: str,
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        result = await db.consultations.delete_one({"_id": ObjectId(consultation_id)})
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Consultation not found")
-        
-        return {"message": "Consultation deleted successfully"}
-    except Exception as e:
+        consultation_oid = ObjectId(consultation_id)
+    except Exception:
         raise HTTPException(status_code=400, detail="Invalid consultation ID")
 
+    before = await db.consultations.find_one_and_delete({"_id": consultation_oid})
+    if before is None:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+
+    await write_tombstone(db, "consultations", before)
+    await audit_writer.record("delete", "consultation", consultation_id, current_user, before=before)
+
+    return {"message": "Consultation deleted successfully"}
+
 @router.get("/doctor/{doctor_id}", response_model=List[ConsultationResponse])
 async def get_doctor_consultations(
     doctor_id: str,
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        consultations = []
-        async for consultation in db.consultations.find({"doctor_id": doctor_id}).sort("created_at", -1):
-            consultations.append(ConsultationResponse(
-                id=str(consultation["_id"]),
-                patient_id=consultation["patient_id"],
-                doctor_id=consultation["doctor_id"],
-                symptoms=consultation["symptoms"],
-                diagnosis=consultation["diagnosis"],
-                icd_code=consultation.get("icd_code"),
-                medications=[MedicationItem(**med) for med in consultation.get("medications", [])],
-                notes=consultation.get("notes"),
-                follow_up_required=consultation.get("follow_up_required", False),
-                follow_up_date=consultation.get("follow_up_date"),
-                created_at=consultation["created_at"]
-            ))
-        return consultations
+        consultations = await db.consultations.find(
+            {"doctor_id": doctor_id}, CONSULTATION_DOCUMENT.projection
+        ).sort("created_at", -1).to_list(length=None)
+        return MedikalResponse(CONSULTATION_DOCUMENT.dump_many(consultations))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error retrieving consultations: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from typing import Optional
+from bson import ObjectId
+import asyncio
+import hashlib
+from database import db
+from security import get_current_user
+from routes.patients import serialize_patient
+from routes.consultation import consultation_to_response
+from routes.ai import AMR_HISTORY_LIMIT, summarize_amr_risk
+
+router = APIRouter(prefix="/api/patients", tags=["patients"])
+
+RECENT_CONSULTATIONS = 10
+
+# Everything the chart and the AMR summary need, in one read
+CONSULTATION_PROJECTION = {
+    "patient_id": 1,
+    "doctor_id": 1,
+    "symptoms": 1,
+    "diagnosis": 1,
+    "icd_code": 1,
+    "medications": 1,
+    "notes": 1,
+    "follow_up_required": 1,
+    "follow_up_date": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "version": 1,
+}
+
+def record_etag(patient: dict, consultations: list) -> str:
+    digest = hashlib.sha1()
+    digest.update(str(patient["_id"]).encode())
+    digest.update(str(patient.get("updated_at")).encode())
+    digest.update(str(patient.get("last_consultation")).encode())
+    for consultation in consultations:
+        digest.update(str(consultation["_id"]).encode())
+        digest.update(str(consultation.get("updated_at")).encode())
+    return f'W/"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+@router.get("/{patient_id}/record")
+async def get_patient_record(
+    patient_id: str,
+    response: Response,
+    limit: int = Query(RECENT_CONSULTATIONS, ge=1, le=AMR_HISTORY_LIMIT),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Patient chart in one round trip: patient, recent consultations and AMR
+    summary. Returns 304 when the chart is unchanged since the client's ETag.
+    """
+    try:
+        patient_oid = ObjectId(patient_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid patient ID")
+
+    patient, consultations = await asyncio.gather(
+        db.patients.find_one({"_id": patient_oid}),
+        db.consultations.find({"patient_id": patient_id}, CONSULTATION_PROJECTION)
+            .sort("created_at", -1)
+            .to_list(length=max(limit, AMR_HISTORY_LIMIT)),
+    )
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    etag = record_etag(patient, consultations)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    return {
+        "patient": serialize_patient(patient),
+        "consultations": [consultation_to_response(c) for c in consultations[:limit]],
+        "amr_risk": summarize_amr_risk(patient_id, consultations[:AMR_HISTORY_LIMIT]),
+    }
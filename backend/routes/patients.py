@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from datetime import datetime
+from database import db
+from models.documents import DocumentAdapter
+from models.patient import PatientCreate, PatientResponse
+from security import get_current_user
+from routes.audit import audit_writer
+from services.encoding import MedikalResponse
+
+router = APIRouter(prefix="/api/patients", tags=["patients"])
+
+PATIENT_DOCUMENT = DocumentAdapter(PatientResponse)
+
+def serialize_patient(patient: dict) -> dict:
+    return PATIENT_DOCUMENT.dump(patient)
+
+@router.post("", response_model=dict)
+async def create_patient(patient: PatientCreate, current_user: dict = Depends(get_current_user)):
+    # Check if patient with same national_id exists
+    existing_patient = await db.patients.find_one({"national_id": patient.national_id})
+    if existing_patient:
+        raise HTTPException(status_code=400, detail="Patient with this National ID already exists")
+    
+    # Create patient document
+    patient_doc = {
+        **patient.dict(),
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+    
+    result = await db.patients.insert_one(patient_doc)
+    await audit_writer.record("create", "patient", str(result.inserted_id), current_user, after=patient_doc)
+    return {"message": "Patient created successfully", "patient_id": str(result.inserted_id)}
+
+@router.get("", response_model=List[PatientResponse])
+async def get_patients(current_user: dict = Depends(get_current_user)):
+    patients = await db.patients.find({}, PATIENT_DOCUMENT.projection).to_list(length=None)
+    return MedikalResponse(PATIENT_DOCUMENT.dump_many(patients))
+
+@router.get("/{patient_id}", response_model=PatientResponse)
+async def get_patient(patient_id: str, current_user: dict = Depends(get_current_user)):
+    from bson import ObjectId
+    
+    try:
+        patient = await db.patients.find_one({"_id": ObjectId(patient_id)}, PATIENT_DOCUMENT.projection)
+        if not patient:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        
+        return MedikalResponse(serialize_patient(patient))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail="Invalid patient ID")
+
+@router.get("/search/{query}", response_model=List[PatientResponse])
+async def search_patients(query: str, current_user: dict = Depends(get_current_user)):
+    # Search by name, phone, or national_id
+    search_filter = {
+        "$or": [
+            {"full_name": {"$regex": query, "$options": "i"}},
+            {"phone": {"$regex": query, "$options": "i"}},
+            {"national_id": {"$regex": query, "$options": "i"}}
+        ]
+    }
+    
+    patients = await db.patients.find(search_filter, PATIENT_DOCUMENT.projection).to_list(length=None)
+    return MedikalResponse(PATIENT_DOCUMENT.dump_many(patients))
@@ -0,0 +1,433 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Dict, Any, Optional, Literal, Tuple
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pydantic import BaseModel, ValidationError
+import base64
+import json
+from database import db
+from security import get_current_user
+from routes.audit import audit_writer
+from models.patient import PatientCreate
+from routes.patients import serialize_patient
+from models.consultation import ConsultationCreate
+from routes.consultation import (
+    consultation_to_response,
+    existing_patient_ids,
+    mark_last_consultation,
+    prescription_interactions,
+)
+from services.drug_interactions import format_warning
+from services.consultation_versioning import INITIAL_VERSION, version_filter, with_medication_ids
+from services.tombstones import TOMBSTONE_EXPIRY, write_tombstones
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+# Server changes returned per collection in one response; the client keeps
+# syncing while has_more is set
+MAX_CHANGES_PER_COLLECTION = 500
+SYNCED_COLLECTIONS = ["patients", "consultations"]
+# updated_at comes from the clock of whichever worker wrote the document,
+# and a write can commit after a later-stamped one was already read. Once a
+# client has caught up, its cursor is moved back by this window so such
+# late writes arrive on the next sync. Clients upsert by id, so receiving
+# a document twice is harmless.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+# Position in one collection: the last (updated_at, _id) the client received.
+# Without an _id the position is inclusive of updated_at.
+Cursor = Optional[Tuple[datetime, Optional[ObjectId]]]
+
+class ClientChange(BaseModel):
+    collection: Literal["patients", "consultations"]
+    client_id: str
+    op: Literal["upsert", "delete"] = "upsert"
+    data: Dict[str, Any] = {}
+    # Server version the client last saw; None for records created offline
+    base_version: Optional[int] = None
+
+class SyncRequest(BaseModel):
+    sync_token: Optional[str] = None
+    changes: List[ClientChange] = []
+
+class SyncResponse(BaseModel):
+    sync_token: str
+    has_more: bool
+    # The token predates the tombstone expiry: the client must drop its
+    # synced records and rebuild them from the full snapshot that follows
+    reset_required: bool = False
+    applied: List[Dict[str, Any]]
+    errors: List[Dict[str, Any]]
+    changes: Dict[str, List[Dict[str, Any]]]
+
+def _decode_cursor(value) -> Cursor:
+    if not value:
+        return None
+    # Tokens issued before the _id tie-break hold a bare timestamp
+    if isinstance(value, str):
+        return datetime.fromisoformat(value), None
+    return datetime.fromisoformat(value["updated_at"]), ObjectId(value["id"]) if value.get("id") else None
+
+def decode_sync_token(token: Optional[str]) -> Tuple[Dict[str, Cursor], Optional[datetime]]:
+    """A sync token holds the client's cursor per collection and when it was issued"""
+    if not token:
+        return {name: None for name in SYNCED_COLLECTIONS + ["deleted"]}, None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode()))
+        positions = {name: _decode_cursor(raw.get(name)) for name in SYNCED_COLLECTIONS + ["deleted"]}
+        if raw.get("issued_at"):
+            issued_at = datetime.fromisoformat(raw["issued_at"])
+        else:
+            # Older tokens weren't stamped; the newest change they hold is a lower bound
+            issued_at = max((cursor[0] for cursor in positions.values() if cursor), default=None)
+        return positions, issued_at
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+def encode_sync_token(positions: Dict[str, Cursor], issued_at: datetime) -> str:
+    raw = {
+        name: {"updated_at": cursor[0].isoformat(), "id": str(cursor[1]) if cursor[1] else None} if cursor else None
+        for name, cursor in positions.items()
+    }
+    raw["issued_at"] = issued_at.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+def snapshot_positions(now: datetime) -> Dict[str, Cursor]:
+    """Start over from every record; a fresh copy needs no earlier deletions"""
+    positions = {name: None for name in SYNCED_COLLECTIONS}
+    positions["deleted"] = (now, None)
+    return positions
+
+def after_cursor(cursor: Cursor) -> dict:
+    if cursor is None:
+        return {}
+    updated_at, last_id = cursor
+    if last_id is None:
+        return {"updated_at": {"$gte": updated_at}}
+    # Documents written in one batch share updated_at, _id orders them
+    return {"$or": [
+        {"updated_at": {"$gt": updated_at}},
+        {"updated_at": updated_at, "_id": {"$gt": last_id}},
+    ]}
+
+async def ensure_sync_indexes():
+    for name in SYNCED_COLLECTIONS:
+        await db[name].create_index(
+            "client_id", unique=True, partialFilterExpression={"client_id": {"$type": "string"}}
+        )
+        await db[name].create_index([("updated_at", 1), ("_id", 1)])
+    # sync_tombstones.updated_at is a TTL index owned by services.retention
+
+def mongo_time(value: datetime) -> datetime:
+    """Mongo stores milliseconds; truncated values compare equal to what is read back"""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def validate_change(change: ClientChange):
+    model = PatientCreate if change.collection == "patients" else ConsultationCreate
+    document = model(**change.data).dict()
+    # Lets replays compare equal to the stored document
+    for field, value in document.items():
+        if isinstance(value, datetime):
+            document[field] = mongo_time(value)
+    return document
+
+def same_content(existing: dict, document: dict) -> bool:
+    """True when writing `document` would not change `existing`, e.g. a replayed batch"""
+    for field, value in document.items():
+        if field != "medications":
+            if existing.get(field) != value:
+                return False
+            continue
+        stored = existing.get("medications", [])
+        if len(stored) != len(value):
+            return False
+        for med, stored_med in zip(value, stored):
+            # Medications sent without an id got one assigned on the first apply
+            if med.get("id") and med["id"] != stored_med.get("id"):
+                return False
+            if any(stored_med.get(key) != item for key, item in med.items() if key != "id"):
+                return False
+    return True
+
+def conflict(collection: str, client_id: str, current: Optional[dict]) -> dict:
+    return {
+        "collection": collection,
+        "client_id": client_id,
+        "error": "Version conflict" if current else "Deleted on the server",
+        "current_version": current.get("version", INITIAL_VERSION) if current else None,
+    }
+
+async def resolve_patient_client_ids(changes: List[ClientChange]) -> Dict[str, str]:
+    """Map patient client ids used as consultation.patient_id to server ids"""
+    references = {
+        change.data.get("patient_id") for change in changes
+        if change.collection == "consultations" and change.op == "upsert"
+    }
+    patient_ids = {}
+    async for doc in db.patients.find({"client_id": {"$in": list(references)}}, {"client_id": 1}):
+        patient_ids[doc["client_id"]] = str(doc["_id"])
+    return patient_ids
+
+async def national_id_owners(documents: List[dict]) -> Dict[str, ObjectId]:
+    national_ids = [document["national_id"] for document in documents]
+    return {
+        doc["national_id"]: doc["_id"]
+        async for doc in db.patients.find({"national_id": {"$in": national_ids}}, {"national_id": 1})
+    }
+
+async def apply_client_changes(changes: List[ClientChange], now: datetime, actor: dict):
+    """
+    Apply client changes with the same compare-and-set as the REST routes.
+    A record the client created offline (no base_version) is inserted.
+    Any other write needs the client's base_version to match the server's
+    version, otherwise it is reported in errors with the current version.
+    Changes that match what the server already holds are skipped, so a
+    replayed batch neither bumps versions nor goes out to other devices.
+    """
+    from pymongo import DeleteOne, UpdateOne
+    
+    applied, errors = [], []
+
+    # Patients first, so consultations in the same batch can reference them by client_id
+    for collection in SYNCED_COLLECTIONS:
+        entity_type = collection[:-1]
+        batch = [change for change in changes if change.collection == collection]
+        if not batch:
+            continue
+        existing = {
+            doc["client_id"]: doc
+            async for doc in db[collection].find({"client_id": {"$in": [change.client_id for change in batch]}})
+        }
+
+        documents = {}
+        for change in batch:
+            if change.op == "delete":
+                continue
+            try:
+                documents[change.client_id] = validate_change(change)
+            except ValidationError as e:
+                errors.append({"collection": collection, "client_id": change.client_id, "error": e.errors()})
+        if collection == "consultations":
+            patient_ids = await resolve_patient_client_ids(batch)
+            for document in documents.values():
+                document["patient_id"] = patient_ids.get(document["patient_id"], document["patient_id"])
+            known_patients = await existing_patient_ids([document["patient_id"] for document in documents.values()])
+        # National IDs are unique, as create_patient enforces
+        owners = await national_id_owners(list(documents.values())) if collection == "patients" else {}
+
+        inserts, pending_inserts, updates = [], [], []
+        interactions = {}
+        for change in batch:
+            if change.op == "delete" or change.client_id not in documents:
+                continue
+            document = documents[change.client_id]
+            current = existing.get(change.client_id)
+            if current is not None and same_content(current, document):
+                applied.append({"collection": collection, "client_id": change.client_id, "id": str(current["_id"])})
+                continue
+            if current is None and change.base_version is not None:
+                errors.append(conflict(collection, change.client_id, None))
+                continue
+            if current is not None and change.base_version != current.get("version", INITIAL_VERSION):
+                errors.append(conflict(collection, change.client_id, current))
+                continue
+            if collection == "patients":
+                owner = owners.get(document["national_id"])
+                if owner is not None and (current is None or owner != current["_id"]):
+                    errors.append({
+                        "collection": collection,
+                        "client_id": change.client_id,
+                        "error": "Patient with this National ID already exists",
+                    })
+                    continue
+                owners[document["national_id"]] = current["_id"] if current else change.client_id
+            elif document["patient_id"] not in known_patients:
+                # create_consultation answers 404 for the same input
+                errors.append({"collection": collection, "client_id": change.client_id, "error": "Patient not found"})
+                continue
+
+            if collection == "consultations":
+                document["medications"] = with_medication_ids(document["medications"])
+            if current is None:
+                if collection == "consultations":
+                    interactions[change.client_id] = await prescription_interactions(
+                        document["patient_id"], [med["name"] for med in document["medications"]]
+                    )
+                inserts.append(UpdateOne(
+                    {"client_id": change.client_id},
+                    {"$setOnInsert": {
+                        **document,
+                        "client_id": change.client_id,
+                        "created_at": now,
+                        "updated_at": now,
+                        "version": INITIAL_VERSION,
+                    }},
+                    upsert=True,
+                ))
+                pending_inserts.append(change)
+            else:
+                updates.append((change, current))
+
+        if inserts:
+            result = await db[collection].bulk_write(inserts, ordered=False)
+            created_for = set()
+            for index, change in enumerate(pending_inserts):
+                server_id = result.upserted_ids.get(index)
+                if server_id is None:
+                    # Created by a concurrent request between our read and write
+                    errors.append(conflict(
+                        collection, change.client_id,
+                        await db[collection].find_one({"client_id": change.client_id}, {"version": 1}),
+                    ))
+                    continue
+                entry = {"collection": collection, "client_id": change.client_id, "id": str(server_id)}
+                if change.client_id in interactions:
+                    entry["warnings"] = [format_warning(finding) for finding in interactions[change.client_id]]
+                    entry["interactions"] = interactions[change.client_id]
+                    created_for.add(documents[change.client_id]["patient_id"])
+                applied.append(entry)
+                await audit_writer.record("sync", entity_type, str(server_id), actor, after=documents[change.client_id])
+            if created_for:
+                await mark_last_consultation(list(created_for), now)
+
+        if updates:
+            result = await db[collection].bulk_write([
+                UpdateOne(
+                    version_filter(current["_id"], change.base_version),
+                    {"$set": {**documents[change.client_id], "updated_at": now, "version": change.base_version + 1}},
+                )
+                for change, current in updates
+            ], ordered=False)
+            stored = None
+            if result.matched_count < len(updates):
+                # Some compare-and-sets lost; re-read to find out which
+                stored = {
+                    doc["_id"]: doc
+                    async for doc in db[collection].find(
+                        {"_id": {"$in": [current["_id"] for _, current in updates]}},
+                        {"version": 1, "updated_at": 1},
+                    )
+                }
+            for change, current in updates:
+                if stored is not None:
+                    doc = stored.get(current["_id"])
+                    if doc is None or doc.get("version") != change.base_version + 1 or doc["updated_at"] != now:
+                        errors.append(conflict(collection, change.client_id, doc))
+                        continue
+                document = documents[change.client_id]
+                applied.append({"collection": collection, "client_id": change.client_id, "id": str(current["_id"])})
+                await audit_writer.record(
+                    "sync", entity_type, str(current["_id"]), actor,
+                    before={field: current.get(field) for field in document}, after=document
+                )
+
+        deletes = []
+        for change in batch:
+            if change.op != "delete":
+                continue
+            current = existing.get(change.client_id)
+            if current is None:
+                # Deleting something the server doesn't have is already in the desired state
+                applied.append({"collection": collection, "client_id": change.client_id, "id": None})
+                continue
+            deletes.append((change, current))
+        if deletes:
+            result = await db[collection].bulk_write([
+                DeleteOne(
+                    version_filter(current["_id"], change.base_version)
+                    if change.base_version is not None else {"_id": current["_id"]}
+                )
+                for change, current in deletes
+            ], ordered=False)
+            remaining = {}
+            if result.deleted_count < len(deletes):
+                remaining = {
+                    doc["_id"]: doc
+                    async for doc in db[collection].find(
+                        {"_id": {"$in": [current["_id"] for _, current in deletes]}}, {"version": 1}
+                    )
+                }
+            deleted = []
+            for change, current in deletes:
+                if current["_id"] in remaining:
+                    errors.append(conflict(collection, change.client_id, remaining[current["_id"]]))
+                    continue
+                deleted.append(current)
+                applied.append({"collection": collection, "client_id": change.client_id, "id": str(current["_id"])})
+                await audit_writer.record("delete", entity_type, str(current["_id"]), actor, before=current)
+            await write_tombstones(db, collection, deleted, now)
+
+    return applied, errors
+
+def serialize_change(collection: str, doc: dict) -> dict:
+    if collection == "patients":
+        item = serialize_patient(doc)
+    else:
+        item = consultation_to_response(doc)
+    item["client_id"] = doc.get("client_id")
+    item["updated_at"] = doc["updated_at"]
+    item["version"] = doc.get("version", INITIAL_VERSION)
+    return item
+
+async def collect_server_changes(positions: Dict[str, Cursor], now: datetime):
+    changes, has_more = {}, False
+    new_positions = dict(positions)
+
+    for collection in SYNCED_COLLECTIONS + ["deleted"]:
+        source = db.sync_tombstones if collection == "deleted" else db[collection]
+        docs = await (
+            source.find(after_cursor(positions[collection]))
+                .sort([("updated_at", 1), ("_id", 1)])
+                .to_list(length=MAX_CHANGES_PER_COLLECTION + 1)
+        )
+        if len(docs) > MAX_CHANGES_PER_COLLECTION:
+            has_more = True
+            docs = docs[:MAX_CHANGES_PER_COLLECTION]
+        if docs:
+            new_positions[collection] = (docs[-1]["updated_at"], docs[-1]["_id"])
+
+        if collection == "deleted":
+            changes[collection] = [
+                {"collection": doc["collection"], "id": doc["id"], "client_id": doc.get("client_id")}
+                for doc in docs
+            ]
+        else:
+            changes[collection] = [serialize_change(collection, doc) for doc in docs]
+
+    if not has_more:
+        overlap_start = now - SYNC_OVERLAP
+        for collection, cursor in new_positions.items():
+            if cursor is not None and cursor[0] > overlap_start:
+                new_positions[collection] = (overlap_start, None)
+
+    return changes, new_positions, has_more
+
+@router.post("/", response_model=SyncResponse)
+async def sync(
+    request: SyncRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delta sync for offline clients: applies a batch of client changes keyed
+    by client-generated ids, then returns every server change since the
+    client's sync token. Stale changes come back as conflicts in errors and
+    replaying the same batch writes nothing. A token older than the
+    tombstone expiry may have missed deletions, so the client is told to
+    reset and gets a full snapshot instead of a delta.
+    """
+    positions, issued_at = decode_sync_token(request.sync_token)
+    now = mongo_time(datetime.utcnow())
+    reset_required = issued_at is not None and issued_at < now - TOMBSTONE_EXPIRY
+    if reset_required:
+        positions = snapshot_positions(now)
+    applied, errors = await apply_client_changes(request.changes, now, current_user)
+    changes, new_positions, has_more = await collect_server_changes(positions, now)
+
+    return SyncResponse(
+        sync_token=encode_sync_token(new_positions, now),
+        has_more=has_more,
+        reset_required=reset_required,
+        applied=applied,
+        errors=errors,
+        changes=changes
+    )
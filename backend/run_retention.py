@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from services.retention import get_policy, rehydrate, run_retention
+
+# Database setup
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/medikal")
+
+
+def format_bytes(value):
+    if value is None:
+        return "n/a"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Archive or rehydrate chat and skin-analysis data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("archive", help="apply retention policies")
+    restore = subparsers.add_parser("rehydrate", help="restore archived documents into the hot collection")
+    restore.add_argument("collection")
+    restore.add_argument("--start", required=True, type=datetime.fromisoformat)
+    restore.add_argument("--end", required=True, type=datetime.fromisoformat)
+    restore.add_argument("--remove-from-archive", action="store_true")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client.medikal
+    try:
+        if args.command == "archive":
+            print("🔄 Applying retention policies...")
+            reports = await run_retention(db)
+            for collection, report in reports.items():
+                if "ttl_seconds" in report:
+                    print(f"⏳ {collection}: TTL index, expires after {timedelta(seconds=report['ttl_seconds'])}")
+                    continue
+                print(
+                    f"✅ {collection}: archived {report['archived']} documents in {report['chunks']} chunks, "
+                    f"{format_bytes(report['raw_bytes'])} -> {format_bytes(report['compressed_bytes'])}, "
+                    f"reclaimed {format_bytes(report['reclaimed_bytes'])}"
+                )
+        else:
+            policy = get_policy(args.collection)
+            restored = await rehydrate(db, policy, args.start, args.end, args.remove_from_archive)
+            print(f"✅ Restored {restored} documents into {args.collection}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+BUFFER_CAPACITY = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL_SECONDS = 1.0
+SHUTDOWN_FLUSH_ATTEMPTS = 5
+COLLECTION_PREFIX = "audit_"
+
+# Bookkeeping fields that change on every write and would only add noise
+IGNORED_FIELDS = {"updated_at", "version"}
+
+
+def bucket_for(timestamp: datetime) -> str:
+    """Audit entries are appended to one collection per month"""
+    return f"{COLLECTION_PREFIX}{timestamp:%Y_%m}"
+
+
+def buckets_between(since: datetime, until: datetime) -> List[str]:
+    buckets, year, month = [], since.year, since.month
+    while (year, month) <= (until.year, until.month):
+        buckets.append(f"{COLLECTION_PREFIX}{year:04d}_{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def diff(before: Optional[dict], after: Optional[dict]) -> Dict[str, Dict[str, Any]]:
+    """Changed fields as {field: {"before": ..., "after": ...}}"""
+    before, after = before or {}, after or {}
+    changes = {}
+    for field in set(before) | set(after):
+        if field == "_id" or field in IGNORED_FIELDS:
+            continue
+        if before.get(field) != after.get(field):
+            changes[field] = {"before": before.get(field), "after": after.get(field)}
+    return changes
+
+
+class AuditWriter:
+    """
+    Collects audit entries in a bounded in-memory buffer and appends them
+    to monthly collections in batches, off the request path.
+
+    Delivery is at least once while the buffer has room: entries get their
+    _id when recorded, a failed batch goes back to the front of the buffer,
+    and duplicate inserts on retry are ignored. The buffer is a ring: if
+    Mongo stays unavailable long enough to fill it, the oldest entries are
+    dropped and counted in metrics rather than growing memory or stalling
+    requests. Nothing here updates or deletes entries.
+    """
+
+    def __init__(self, db, capacity: int = BUFFER_CAPACITY, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        self.db = db
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = deque(maxlen=capacity)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._indexed_buckets = set()
+        self.written = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and drain the buffer"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for attempt in range(SHUTDOWN_FLUSH_ATTEMPTS):
+            if not self._buffer:
+                break
+            await self.flush()
+            if self._buffer:
+                await asyncio.sleep(0.2 * (attempt + 1))
+        if self._buffer:
+            logger.error("Shutting down with %d unwritten audit entries", len(self._buffer))
+
+    async def record(self, action: str, entity_type: str, entity_id: str, actor: Optional[dict],
+                     before: Optional[dict] = None, after: Optional[dict] = None,
+                     changes: Optional[dict] = None):
+        if self._task is None:
+            await self.start()
+        timestamp = datetime.utcnow()
+        if len(self._buffer) == self.capacity:
+            self._drop(1)
+        self._buffer.append({
+            "_id": ObjectId(),
+            "timestamp": timestamp,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "actor_id": str(actor["_id"]) if actor else None,
+            "actor_username": actor.get("username") if actor else None,
+            "actor_role": actor.get("role") if actor else None,
+            "changes": changes if changes is not None else diff(before, after),
+        })
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drop(self, count: int):
+        if self.dropped == 0:
+            logger.error("Audit buffer full, dropping the oldest entries")
+        self.dropped += count
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    await self._write(batch)
+                except Exception:
+                    self.failed_flushes += 1
+                    logger.exception("Audit flush failed, %d entries will be retried", len(batch))
+                    # Entries recorded meanwhile may leave no room for all of them
+                    overflow = len(self._buffer) + len(batch) - self.capacity
+                    if overflow > 0:
+                        self._drop(overflow)
+                        batch = batch[overflow:]
+                    self._buffer.extendleft(reversed(batch))
+                    return
+
+    async def _write(self, batch: List[dict]):
+        from pymongo.errors import BulkWriteError
+
+        by_bucket: Dict[str, List[dict]] = {}
+        for entry in batch:
+            by_bucket.setdefault(bucket_for(entry["timestamp"]), []).append(entry)
+
+        for bucket, entries in by_bucket.items():
+            await self._ensure_indexes(bucket)
+            try:
+                await self.db[bucket].insert_many(entries, ordered=False)
+            except BulkWriteError as e:
+                # Duplicate keys are entries written by an earlier, partially failed flush
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            self.written += len(entries)
+
+    async def _ensure_indexes(self, bucket: str):
+        if bucket in self._indexed_buckets:
+            return
+        await self.db[bucket].create_index([("entity_type", 1), ("entity_id", 1), ("timestamp", -1)])
+        await self.db[bucket].create_index([("actor_id", 1), ("timestamp", -1)])
+        self._indexed_buckets.add(bucket)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def metrics(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+        }
+
+
+async def query_audit_log(db, since: datetime, until: datetime, entity_type: Optional[str] = None,
+                          entity_id: Optional[str] = None, actor_id: Optional[str] = None,
+                          limit: int = 100) -> List[dict]:
+    """Newest first across the monthly buckets covering [since, until]"""
+    query: Dict[str, Any] = {"timestamp": {"$gte": since, "$lte": until}}
+    if entity_type:
+        query["entity_type"] = entity_type
+    if entity_id:
+        query["entity_id"] = entity_id
+    if actor_id:
+        query["actor_id"] = actor_id
+
+    entries = []
+    for bucket in reversed(buckets_between(since, until)):
+        remaining = limit - len(entries)
+        if remaining <= 0:
+            break
+        entries.extend(await db[bucket].find(query).sort("timestamp", -1).to_list(length=remaining))
+    return entries
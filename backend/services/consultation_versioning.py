@@ -0,0 +1,139 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from bson import ObjectId
+
+# Documents written before versioning was introduced have no `version` field
+INITIAL_VERSION = 1
+MAX_RETRIES = 5
+
+
+class ConsultationNotFound(Exception):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, current_version: int):
+        self.current_version = current_version
+        super().__init__(f"Consultation was modified, current version is {current_version}")
+
+
+class MedicationNotFound(Exception):
+    def __init__(self, medication_id: str):
+        self.medication_id = medication_id
+        super().__init__(f"Medication {medication_id} not found")
+
+
+def version_filter(consultation_id: ObjectId, version: int) -> dict:
+    if version == INITIAL_VERSION:
+        return {
+            "_id": consultation_id,
+            "$or": [{"version": INITIAL_VERSION}, {"version": {"$exists": False}}],
+        }
+    return {"_id": consultation_id, "version": version}
+
+
+def new_medication_id() -> str:
+    return str(ObjectId())
+
+
+def with_medication_ids(medications: List[dict]) -> List[dict]:
+    """Give every medication a stable id so it can be patched individually"""
+    return [med if med.get("id") else {**med, "id": new_medication_id()} for med in medications]
+
+
+def apply_medication_operations(medications: List[dict], operations: List[dict]) -> List[dict]:
+    medications = with_medication_ids(medications)
+    for operation in operations:
+        op = operation["op"]
+        if op == "add":
+            medications.append(with_medication_ids([operation["medication"]])[0])
+            continue
+
+        index = next(
+            (i for i, med in enumerate(medications) if med["id"] == operation["id"]), None
+        )
+        if index is None:
+            raise MedicationNotFound(operation["id"])
+        if op == "remove":
+            del medications[index]
+        elif op == "modify":
+            changes = {k: v for k, v in operation["changes"].items() if v is not None}
+            medications[index] = {**medications[index], **changes, "id": operation["id"]}
+    return medications
+
+
+async def _current_version(collection, consultation_id: ObjectId) -> int:
+    consultation = await collection.find_one({"_id": consultation_id}, {"version": 1})
+    if consultation is None:
+        raise ConsultationNotFound()
+    return consultation.get("version", INITIAL_VERSION)
+
+
+async def update_fields(collection, consultation_id: ObjectId, update_data: dict,
+                        expected_version: Optional[int] = None) -> Tuple[int, dict]:
+    """
+    Compare-and-set update of top level fields. Without an expected version
+    the update wins against concurrent writers but still bumps the version.
+    Returns the new version and the updated fields as they were before.
+    """
+    if "medications" in update_data:
+        update_data["medications"] = with_medication_ids(update_data["medications"])
+
+    # With an expected version the compare-and-set goes straight out; the
+    # document is only read to tell a conflict from a missing consultation
+    version = expected_version
+    attempts = 1 if expected_version is not None else MAX_RETRIES
+    for _ in range(attempts):
+        if version is None:
+            version = await _current_version(collection, consultation_id)
+
+        before = await collection.find_one_and_update(
+            version_filter(consultation_id, version),
+            {"$set": {**update_data, "version": version + 1, "updated_at": datetime.utcnow()}},
+            projection={field: 1 for field in update_data},
+        )
+        if before is not None:
+            return version + 1, before
+        version = await _current_version(collection, consultation_id)
+
+    raise VersionConflict(version)
+
+
+async def patch_medications(collection, consultation_id: ObjectId, operations: List[dict],
+                            expected_version: Optional[int] = None) -> dict:
+    """
+    Apply add/remove/modify operations to the medications array. With an
+    expected version a stale client gets a VersionConflict; without one the
+    operations are re-applied on the latest document until they win the race.
+    """
+    attempts = 1 if expected_version is not None else MAX_RETRIES
+    for _ in range(attempts):
+        consultation = await collection.find_one(
+            {"_id": consultation_id}, {"medications": 1, "version": 1}
+        )
+        if consultation is None:
+            raise ConsultationNotFound()
+
+        version = consultation.get("version", INITIAL_VERSION)
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(version)
+
+        medications = apply_medication_operations(consultation.get("medications", []), operations)
+        result = await collection.update_one(
+            version_filter(consultation_id, version),
+            {
+                "$set": {
+                    "medications": medications,
+                    "version": version + 1,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+        if result.matched_count == 1:
+            return {
+                "version": version + 1,
+                "medications": medications,
+                "previous_medications": consultation.get("medications", []),
+            }
+
+    raise VersionConflict(await _current_version(collection, consultation_id))
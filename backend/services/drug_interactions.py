@@ -0,0 +1,142 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_TABLE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "drug_interactions.json"
+)
+SEVERITY_ORDER = {"major": 0, "moderate": 1, "minor": 2}
+
+
+def normalize_drug_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class InteractionGraph:
+    """
+    Drug interaction table as an adjacency index. Drug names are interned
+    to integer ids once at load time; each id maps to the ids it interacts
+    with and the interaction record, so checking a prescription costs one
+    dict lookup per pair.
+
+    Table format:
+        {"groups": {"nsaids": ["ibuprofen", ...]},
+         "interactions": [{"drugs": ["warfarin", "@nsaids"], "severity": "major",
+                           "description": "..."}]}
+    A name starting with "@" refers to every drug in that group.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._adjacency: List[Dict[int, int]] = []
+        self._interactions: List[dict] = []
+
+    @classmethod
+    def from_table(cls, table: dict) -> "InteractionGraph":
+        graph = cls()
+        groups = {
+            name: [normalize_drug_name(drug) for drug in drugs]
+            for name, drugs in table.get("groups", {}).items()
+        }
+
+        def expand(name):
+            if name.startswith("@"):
+                return groups[name[1:]]
+            return [normalize_drug_name(name)]
+
+        for interaction in table.get("interactions", []):
+            first, second = interaction["drugs"]
+            record = {
+                "severity": interaction.get("severity", "moderate"),
+                "description": interaction["description"],
+            }
+            for a in expand(first):
+                for b in expand(second):
+                    graph.add_interaction(a, b, record)
+        return graph
+
+    @classmethod
+    def from_file(cls, path: str) -> "InteractionGraph":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_table(json.load(f))
+
+    def _intern(self, name: str) -> int:
+        drug_id = self._ids.get(name)
+        if drug_id is None:
+            drug_id = len(self._names)
+            self._ids[name] = drug_id
+            self._names.append(name)
+            self._adjacency.append({})
+        return drug_id
+
+    def add_interaction(self, a: str, b: str, record: dict):
+        if a == b:
+            return
+        a_id, b_id = self._intern(a), self._intern(b)
+        self._interactions.append(record)
+        index = len(self._interactions) - 1
+        self._adjacency[a_id][b_id] = index
+        self._adjacency[b_id][a_id] = index
+
+    @property
+    def drug_count(self) -> int:
+        return len(self._names)
+
+    @property
+    def interaction_count(self) -> int:
+        return len(self._interactions)
+
+    def _lookup(self, names: Iterable[str]) -> Dict[int, str]:
+        """Known drugs by id, keeping the caller's spelling for messages"""
+        found = {}
+        for name in names:
+            drug_id = self._ids.get(normalize_drug_name(name))
+            if drug_id is not None and drug_id not in found:
+                found[drug_id] = name
+        return found
+
+    def check(self, prescription: Iterable[str], active: Iterable[str] = ()) -> List[dict]:
+        """
+        Interactions between every pair in the prescription and between
+        the prescription and the patient's active medications.
+        """
+        prescribed = self._lookup(prescription)
+        current = {k: v for k, v in self._lookup(active).items() if k not in prescribed}
+        prescribed_ids = list(prescribed)
+
+        findings = []
+        for i, a_id in enumerate(prescribed_ids):
+            neighbours = self._adjacency[a_id]
+            for b_id in prescribed_ids[i + 1:]:
+                index = neighbours.get(b_id)
+                if index is not None:
+                    findings.append(self._finding(prescribed[a_id], prescribed[b_id], index, False))
+            for b_id, b_name in current.items():
+                index = neighbours.get(b_id)
+                if index is not None:
+                    findings.append(self._finding(prescribed[a_id], b_name, index, True))
+
+        findings.sort(key=lambda f: SEVERITY_ORDER.get(f["severity"], len(SEVERITY_ORDER)))
+        return findings
+
+    def _finding(self, a: str, b: str, index: int, with_active: bool) -> dict:
+        record = self._interactions[index]
+        return {
+            "drugs": [a, b],
+            "severity": record["severity"],
+            "description": record["description"],
+            "with_active_medication": with_active,
+        }
+
+
+def format_warning(finding: dict) -> str:
+    a, b = finding["drugs"]
+    source = " (active medication)" if finding["with_active_medication"] else ""
+    return f"{finding['severity'].capitalize()} interaction: {a} + {b}{source}. {finding['description']}"
+
+
+@lru_cache(maxsize=1)
+def get_interaction_graph(path: Optional[str] = None) -> InteractionGraph:
+    return InteractionGraph.from_file(path or os.getenv("DRUG_INTERACTIONS_PATH", DEFAULT_TABLE_PATH))
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSIONS = 2048
+NGRAM_RANGE = (3, 5)
+DEFAULT_THRESHOLD = 0.35
+RELOAD_CHECK_SECONDS = 2.0
+DEFAULT_LANGUAGE = "en"
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so 'fièvre' and 'fievre' share n-grams"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " " + " ".join(stripped.split()) + " "
+
+
+def vectorize(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> np.ndarray:
+    """L2-normalised hashed character n-gram counts"""
+    text = normalize(text)
+    indices = [
+        zlib.crc32(text[i:i + n].encode()) % dimensions
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1)
+        for i in range(len(text) - n + 1)
+    ]
+    vector = np.bincount(indices, minlength=dimensions).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Index:
+    def __init__(self, matrix, row_intents, responses, threshold):
+        self.matrix = matrix
+        self.row_intents = row_intents
+        self.responses = responses
+        self.threshold = threshold
+
+
+class IntentIndex:
+    """
+    Precomputed intent vectors for every language in the catalogue. Each
+    (intent, language) pair is one row holding the centroid of its
+    examples, so a query is a single matrix-vector product.
+
+    The catalogue file is re-read when its mtime changes, checked at most
+    every RELOAD_CHECK_SECONDS. Queries trigger the check but the rebuild
+    runs on a background thread and is swapped in when done, so neither
+    the event loop nor concurrent requests wait on a half-built matrix.
+    """
+
+    def __init__(self, path: str, dimensions: int = DEFAULT_DIMENSIONS):
+        self.path = path
+        self.dimensions = dimensions
+        self._index: Optional[_Index] = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @classmethod
+    def from_catalogue(cls, catalogue: dict, dimensions: int = DEFAULT_DIMENSIONS) -> "IntentIndex":
+        index = cls.__new__(cls)
+        index.path = None
+        index.dimensions = dimensions
+        index._lock = threading.Lock()
+        index._checked_at = 0.0
+        index._mtime = None
+        index._index = index._build(catalogue)
+        return index
+
+    def _build(self, catalogue: dict) -> _Index:
+        rows, row_intents, responses = [], [], {}
+        for intent in catalogue["intents"]:
+            responses[intent["id"]] = intent.get("responses", {})
+            for language, examples in intent.get("examples", {}).items():
+                if not examples:
+                    continue
+                centroid = np.sum([vectorize(example, self.dimensions) for example in examples], axis=0)
+                norm = np.linalg.norm(centroid)
+                rows.append(centroid / norm if norm else centroid)
+                row_intents.append(intent["id"])
+
+        matrix = np.vstack(rows).astype(np.float32) if rows else np.zeros((0, self.dimensions), np.float32)
+        return _Index(matrix, np.array(row_intents), responses,
+                      catalogue.get("threshold", DEFAULT_THRESHOLD))
+
+    def reload(self) -> bool:
+        """Rebuild from the catalogue file if it changed. Returns True on reload."""
+        if self.path is None:
+            return False
+        with self._lock:
+            mtime = os.stat(self.path).st_mtime
+            self._checked_at = time.monotonic()
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding="utf-8") as f:
+                self._index = self._build(json.load(f))
+            self._mtime = mtime
+            return True
+
+    def _maybe_reload(self):
+        if self.path is None or time.monotonic() - self._checked_at <= RELOAD_CHECK_SECONDS:
+            return
+        if self._lock.locked():
+            return  # a reload is already running
+        self._checked_at = time.monotonic()
+        threading.Thread(target=self._reload_in_background, daemon=True).start()
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except Exception:
+            # Keep answering from the current index until the file is fixed
+            logger.exception("Reloading intents from %s failed", self.path)
+
+    def top_k(self, text: str, k: int = 3) -> List[Tuple[str, float]]:
+        """Best distinct intents by cosine similarity, highest first"""
+        self._maybe_reload()
+        index = self._index
+        if index.matrix.shape[0] == 0:
+            return []
+
+        scores = index.matrix @ vectorize(text, self.dimensions)
+        # Intents have one row per language, so over-fetch before de-duplicating
+        fetch = min(len(scores), k * 4)
+        candidates = np.argpartition(-scores, fetch - 1)[:fetch]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        results, seen = [], set()
+        for row in candidates:
+            intent_id = str(index.row_intents[row])
+            if intent_id in seen:
+                continue
+            seen.add(intent_id)
+            results.append((intent_id, float(scores[row])))
+            if len(results) == k:
+                break
+        return results
+
+    def match(self, text: str) -> Optional[Tuple[str, float]]:
+        """The best intent if it clears the catalogue threshold"""
+        results = self.top_k(text, k=1)
+        if results and results[0][1] >= self._index.threshold:
+            return results[0]
+        return None
+
+    def response(self, intent_id: str, language: str) -> Optional[str]:
+        """Response in the requested language, falling back to English"""
+        responses: Dict[str, str] = self._index.responses.get(intent_id, {})
+        return responses.get(language) or responses.get(DEFAULT_LANGUAGE)
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_COLLECTION = "invalidation_state"
+POLL_INTERVAL_SECONDS = 1.0
+# Each poll re-reads this far behind the newest `updated_at` it has seen,
+# so writes that commit late (or share a timestamp) aren't skipped
+POLL_OVERLAP = timedelta(seconds=15)
+LAG_SAMPLES = 1000
+# Positions are persisted this often rather than on every event
+STATE_SAVE_INTERVAL_SECONDS = 5.0
+CHANGE_STREAM_AWAIT_MS = 1000
+# Reconnect delays double from the initial value up to the maximum
+RETRY_INITIAL_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+# ChangeStreamHistoryLost, ChangeStreamFatalError
+CHANGE_STREAM_HISTORY_LOST = (286, 280)
+
+
+class LocalCache:
+    """
+    Minimal in-process cache keyed by document id. Register it with the
+    InvalidationBus so writes from any worker evict the stale entry.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, tuple] = {}
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: str, value):
+        self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class InvalidationBus:
+    """
+    Tails Mongo change streams for the watched collections and fans out
+    (collection, document_id, operation) events to registered caches.
+
+    Standalone servers have no change streams; there the bus polls
+    `updated_at` instead, so every write to a watched collection has to
+    stamp it. Polling cannot see deletes, so caches used with it should
+    also carry a TTL. The resume token (or the last polled
+    `updated_at`) is persisted every few seconds and on stop, so a
+    restarted worker picks up where it left off; at worst it replays a
+    few seconds of invalidations. Connection errors are retried with
+    backoff for as long as the bus runs.
+    """
+
+    def __init__(self, db, collections: List[str], mode: str = "auto",
+                 poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.db = db
+        self.collections = collections
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.active_mode: Optional[str] = None
+        self._caches: Dict[str, list] = defaultdict(list)
+        self._listeners: List[Callable] = []
+        self._task: Optional[asyncio.Task] = None
+        self._lag = deque(maxlen=LAG_SAMPLES)
+        self._events = defaultdict(int)
+        self._resume_token = None
+        self._state_loaded = False
+        self._last_seen: Dict[str, datetime] = {}
+        self._saved_positions: Dict[str, datetime] = {}
+        # Per collection: id -> updated_at already dispatched within the overlap
+        self._polled: Dict[str, Dict[str, datetime]] = defaultdict(dict)
+        self._saved_at = 0.0
+        self._failures = 0
+
+    def register(self, collection: str, cache):
+        """Register a cache exposing invalidate(key) and clear()"""
+        self._caches[collection].append(cache)
+
+    def add_listener(self, listener: Callable):
+        """Register a callable(collection, document_id, operation)"""
+        self._listeners.append(listener)
+
+    async def start(self):
+        if self.mode == "off" or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self._save_position(force=True)
+        except Exception:
+            logger.exception("Saving the invalidation position on shutdown failed")
+
+    def dispatch(self, collection: str, document_id: str, operation: str,
+                 changed_at: Optional[datetime] = None):
+        self._events[collection] += 1
+        if changed_at is not None:
+            self._lag.append(max(0.0, (datetime.utcnow() - changed_at).total_seconds()))
+
+        for cache in self._caches.get(collection, []):
+            if operation in ("drop", "rename", "invalidate"):
+                cache.clear()
+            else:
+                cache.invalidate(document_id)
+        for listener in self._listeners:
+            try:
+                listener(collection, document_id, operation)
+            except Exception:
+                logger.exception("Invalidation listener failed")
+
+    def metrics(self) -> dict:
+        lag = sorted(self._lag)
+        return {
+            "mode": self.active_mode,
+            "events": dict(self._events),
+            "lag_seconds": {
+                "samples": len(lag),
+                "avg": sum(lag) / len(lag) if lag else None,
+                "p95": lag[min(len(lag) - 1, int(len(lag) * 0.95))] if lag else None,
+                "max": lag[-1] if lag else None,
+            },
+        }
+
+    async def _run(self):
+        from pymongo.errors import OperationFailure
+
+        use_change_streams = self.mode in ("auto", "change_stream")
+        while True:
+            try:
+                if use_change_streams:
+                    await self._watch_change_streams()
+                else:
+                    await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_HISTORY_LOST:
+                    # The saved position fell off the oplog: start from now and
+                    # drop everything cached, since some events were missed
+                    logger.warning("Change stream history lost, resetting caches")
+                    self._resume_token = None
+                    for collection in self.collections:
+                        self.dispatch(collection, "", "invalidate")
+                    continue
+                if self.mode == "auto" and self.active_mode is None:
+                    logger.info("Change streams unavailable (%s), falling back to polling", e)
+                    use_change_streams = False
+                    continue
+                await self._backoff()
+            except Exception:
+                await self._backoff()
+
+    async def _backoff(self):
+        """Sleep before reconnecting; the delay grows until a connection succeeds"""
+        self._failures += 1
+        delay = min(RETRY_MAX_SECONDS, RETRY_INITIAL_SECONDS * 2 ** (self._failures - 1))
+        logger.exception("Invalidation %s failed, retrying in %.1fs", self.active_mode or "bus", delay)
+        await asyncio.sleep(delay)
+
+    async def _load_state(self, key: str):
+        state = await self.db[STATE_COLLECTION].find_one({"_id": key})
+        return state["value"] if state else None
+
+    async def _save_state(self, key: str, value):
+        await self.db[STATE_COLLECTION].update_one(
+            {"_id": key}, {"$set": {"value": value, "saved_at": datetime.utcnow()}}, upsert=True
+        )
+
+    async def _save_position(self, force: bool = False):
+        """Persist the resume token or poll positions, at most every STATE_SAVE_INTERVAL"""
+        if not force and time.monotonic() - self._saved_at < STATE_SAVE_INTERVAL_SECONDS:
+            return
+        self._saved_at = time.monotonic()
+        if self.active_mode == "change_stream" and self._resume_token is not None:
+            await self._save_state("change_stream", self._resume_token)
+        elif self.active_mode == "polling":
+            for collection, newest in self._last_seen.items():
+                if self._saved_positions.get(collection) != newest:
+                    await self._save_state(f"poll:{collection}", newest)
+                    self._saved_positions[collection] = newest
+
+    async def _watch_change_streams(self):
+        if not self._state_loaded:
+            self._resume_token = await self._load_state("change_stream")
+            self._state_loaded = True
+        pipeline = [{"$match": {"ns.coll": {"$in": self.collections}}}]
+        async with self.db.watch(
+            pipeline, resume_after=self._resume_token, max_await_time_ms=CHANGE_STREAM_AWAIT_MS
+        ) as stream:
+            self.active_mode = "change_stream"
+            self._failures = 0
+            while stream.alive:
+                # Returns None after max_await_time_ms without events, which
+                # still advances the resume token and lets it be saved
+                change = await stream.try_next()
+                if change is not None:
+                    collection = change.get("ns", {}).get("coll")
+                    document_id = str(change.get("documentKey", {}).get("_id", ""))
+                    cluster_time = change.get("clusterTime")
+                    changed_at = (
+                        datetime.utcfromtimestamp(cluster_time.time) if cluster_time is not None else None
+                    )
+                    self.dispatch(collection, document_id, change["operationType"], changed_at)
+                self._resume_token = stream.resume_token
+                await self._save_position()
+
+    async def _poll(self):
+        from pymongo.errors import PyMongoError
+
+        self.active_mode = "polling"
+        for collection in self.collections:
+            if collection not in self._last_seen:
+                await self.db[collection].create_index([("updated_at", 1), ("_id", 1)])
+                self._last_seen[collection] = (
+                    await self._load_state(f"poll:{collection}") or datetime.utcnow()
+                )
+                self._saved_positions[collection] = self._last_seen[collection]
+        self._failures = 0
+
+        while True:
+            for collection in self.collections:
+                try:
+                    await self._poll_collection(collection)
+                except PyMongoError:
+                    logger.exception("Polling %s for invalidations failed", collection)
+            try:
+                await self._save_position()
+            except PyMongoError:
+                logger.exception("Saving invalidation poll positions failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll_collection(self, collection: str):
+        polled = self._polled[collection]
+        since = self._last_seen[collection] - POLL_OVERLAP
+        cursor = self.db[collection].find(
+            {"updated_at": {"$gte": since}}, {"updated_at": 1}
+        ).sort([("updated_at", 1), ("_id", 1)])
+        async for doc in cursor:
+            document_id = str(doc["_id"])
+            if polled.get(document_id) == doc["updated_at"]:
+                continue
+            polled[document_id] = doc["updated_at"]
+            self.dispatch(collection, document_id, "update", doc["updated_at"])
+            if doc["updated_at"] > self._last_seen[collection]:
+                self._last_seen[collection] = doc["updated_at"]
+
+        since = self._last_seen[collection] - POLL_OVERLAP
+        for document_id in [key for key, seen in polled.items() if seen < since]:
+            del polled[document_id]
@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import defaultdict, deque
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from bson import Binary, ObjectId
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+POLL_INTERVAL_SECONDS = 0.5
+# A claimed job is leased to its worker, which renews the lease while it
+# runs. Jobs whose lease ran out belonged to a worker that died and are
+# queued again by the sweep every other worker runs.
+LEASE_DURATION = timedelta(seconds=60)
+LEASE_RENEW_SECONDS = 20.0
+SWEEP_INTERVAL_SECONDS = 30.0
+# Jobs claimed before leases existed have none; treat them as stale after this
+STALE_AFTER = timedelta(minutes=10)
+TIMING_SAMPLES = 1000
+# Workers back off exponentially between errors up to the maximum
+WORKER_BACKOFF_SECONDS = 0.5
+WORKER_BACKOFF_MAX_SECONDS = 30.0
+FINISH_ATTEMPTS = 5
+RELEASED_CLAIM = {"started_at": "", "worker_id": "", "lease_until": ""}
+
+
+class LocalBroker:
+    """In-process queue of job ids. Used in development and tests."""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def put(self, job_id: ObjectId):
+        await self.queue.put(job_id)
+
+    async def get(self) -> ObjectId:
+        return await self.queue.get()
+
+    async def depth(self) -> int:
+        return self.queue.qsize()
+
+
+class MongoBroker:
+    """
+    Uses the job collection itself as the queue, so any worker on any node
+    can pick up a job. Claiming is left to the atomic status transition.
+    """
+
+    def __init__(self, db, collection_name: str, poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.db = db
+        self.collection_name = collection_name
+        self.poll_interval = poll_interval
+
+    async def put(self, job_id: ObjectId):
+        pass  # the persisted queued job is the message
+
+    async def get(self) -> ObjectId:
+        while True:
+            job = await self.db[self.collection_name].find_one(
+                {"status": QUEUED}, {"_id": 1}, sort=[("created_at", 1)]
+            )
+            if job is not None:
+                return job["_id"]
+            await asyncio.sleep(self.poll_interval)
+
+    async def depth(self) -> int:
+        return await self.db[self.collection_name].count_documents({"status": QUEUED})
+
+
+class JobQueue:
+    """
+    Persisted jobs with status transitions queued -> running -> succeeded or
+    failed. `process` does the CPU work on a bounded executor (processes by
+    default) and must be a picklable top-level function taking the job's
+    input bytes. `on_success` runs on the event loop with the job and the
+    processed result and returns what is stored as the job's result.
+    """
+
+    def __init__(self, db, collection_name: str, process: Callable[[bytes], dict],
+                 on_success: Optional[Callable[[dict, dict], Awaitable[dict]]] = None,
+                 broker=None, workers: int = 2, executor: str = "process"):
+        self.db = db
+        self.collection_name = collection_name
+        self.process = process
+        self.on_success = on_success
+        self.broker = broker or LocalBroker()
+        self.workers = workers
+        self.executor_kind = executor
+        self._executor = None
+        self._tasks = []
+        self._maintenance: Optional[asyncio.Task] = None
+        # Identifies this queue's claims, so its leases can be renewed and released
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+        self._finished_events: Dict[str, asyncio.Event] = {}
+        self._processing_ms = deque(maxlen=TIMING_SAMPLES)
+        self._counts = defaultdict(int)
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.started:
+            return
+        self._executor = self._create_executor()
+        await self.collection.create_index([("status", 1), ("created_at", 1)])
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    def _create_executor(self):
+        executor_cls = ProcessPoolExecutor if self.executor_kind == "process" else ThreadPoolExecutor
+        return executor_cls(max_workers=self.workers)
+
+    async def stop(self):
+        tasks = self._tasks + ([self._maintenance] if self._maintenance else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._maintenance = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        # Jobs interrupted by the shutdown go back to the queue right away
+        # instead of waiting for their lease to run out
+        try:
+            await self.collection.update_many(
+                {"status": RUNNING, "worker_id": self.worker_id},
+                {"$set": {"status": QUEUED}, "$unset": RELEASED_CLAIM},
+            )
+        except Exception:
+            logger.exception("Releasing running jobs on shutdown failed")
+
+    async def _recover(self):
+        await self._requeue_expired()
+        if isinstance(self.broker, LocalBroker):
+            async for job in self.collection.find({"status": QUEUED}, {"_id": 1}).sort("created_at", 1):
+                await self.broker.put(job["_id"])
+
+    async def _requeue_expired(self):
+        now = datetime.utcnow()
+        expired = {
+            "status": RUNNING,
+            "$or": [
+                {"lease_until": {"$lt": now}},
+                {"lease_until": {"$exists": False}, "started_at": {"$lt": now - STALE_AFTER}},
+            ],
+        }
+        async for job in self.collection.find(expired, {"_id": 1}):
+            result = await self.collection.update_one(
+                {**expired, "_id": job["_id"]},
+                {"$set": {"status": QUEUED}, "$unset": RELEASED_CLAIM},
+            )
+            if result.modified_count:
+                logger.warning("Job %s lost its worker, queued again", job["_id"])
+                self._counts["requeued"] += 1
+                await self.broker.put(job["_id"])
+
+    async def _maintain(self):
+        """Renew this worker's leases and requeue jobs whose lease expired"""
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                await self.collection.update_many(
+                    {"status": RUNNING, "worker_id": self.worker_id},
+                    {"$set": {"lease_until": datetime.utcnow() + LEASE_DURATION}},
+                )
+                if time.monotonic() - last_sweep >= SWEEP_INTERVAL_SECONDS:
+                    last_sweep = time.monotonic()
+                    await self._requeue_expired()
+            except Exception:
+                logger.exception("Job lease maintenance failed")
+
+    async def submit(self, payload: bytes, **fields) -> str:
+        if not self.started:
+            await self.start()
+        job = {
+            **fields,
+            "status": QUEUED,
+            "input": Binary(payload),
+            "created_at": datetime.utcnow(),
+        }
+        result = await self.collection.insert_one(job)
+        self._counts["submitted"] += 1
+        await self.broker.put(result.inserted_id)
+        return str(result.inserted_id)
+
+    async def active_jobs(self, **fields) -> int:
+        """Queued or running jobs matching `fields`, e.g. one user's. Running
+        jobs whose lease expired are about to be requeued and don't count."""
+        return await self.collection.count_documents({
+            **fields,
+            "$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "lease_until": {"$gte": datetime.utcnow()}},
+            ],
+        })
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": ObjectId(job_id)}, {"input": 0})
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Return the job once finished, or as it stands when the timeout runs out"""
+        deadline = time.monotonic() + timeout
+        event = self._finished_events.setdefault(job_id, asyncio.Event())
+        try:
+            while True:
+                job = await self.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job["status"] in FINISHED or remaining <= 0:
+                    return job
+                # Woken early when this process finishes the job, polls for other nodes
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, POLL_INTERVAL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._finished_events.pop(job_id, None)
+
+    async def _worker(self):
+        failures = 0
+        while True:
+            try:
+                await self._run_next()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Mongo being unreachable must not end the worker for good
+                failures += 1
+                delay = min(WORKER_BACKOFF_MAX_SECONDS, WORKER_BACKOFF_SECONDS * 2 ** (failures - 1))
+                logger.exception("Job worker error, retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+
+    async def _run_next(self):
+        job_id = await self.broker.get()
+        try:
+            now = datetime.utcnow()
+            job = await self.collection.find_one_and_update(
+                {"_id": job_id, "status": QUEUED},
+                {"$set": {
+                    "status": RUNNING,
+                    "started_at": now,
+                    "worker_id": self.worker_id,
+                    "lease_until": now + LEASE_DURATION,
+                }},
+            )
+        except Exception:
+            # Still queued in Mongo, so hand it back rather than lose it until a restart
+            await self.broker.put(job_id)
+            raise
+        if job is None:
+            return  # claimed by another worker
+
+        started = time.perf_counter()
+        executor = self._executor
+        try:
+            processed = await asyncio.get_running_loop().run_in_executor(
+                executor, self.process, bytes(job["input"])
+            )
+            result = await self.on_success(job, processed) if self.on_success else processed
+            update = {"status": SUCCEEDED, "result": result}
+        except asyncio.CancelledError:
+            raise
+        except BrokenExecutor as e:
+            # A crashed child process breaks the whole pool; every later
+            # job would fail the same way until it is replaced
+            logger.exception("Executor broke while running job %s", job_id)
+            self._replace_executor(executor)
+            update = {"status": FAILED, "error": f"Worker process crashed: {e}"}
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            update = {"status": FAILED, "error": str(e)}
+
+        processing_ms = (time.perf_counter() - started) * 1000
+        self._processing_ms.append(processing_ms)
+        self._counts[update["status"]] += 1
+        await self._finish(job_id, update, processing_ms)
+        event = self._finished_events.get(str(job_id))
+        if event is not None:
+            event.set()
+
+    def _replace_executor(self, broken):
+        # Workers share the executor, only the first to notice replaces it
+        if self._executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._create_executor()
+        self._counts["executor_restarts"] += 1
+
+    async def _finish(self, job_id: ObjectId, update: dict, processing_ms: float):
+        """Store the outcome, retrying so a finished job isn't left running until recovery"""
+        for attempt in range(FINISH_ATTEMPTS):
+            try:
+                result = await self.collection.update_one(
+                    # A job whose lease lapsed may have been claimed elsewhere
+                    {"_id": job_id, "worker_id": self.worker_id},
+                    {
+                        "$set": {**update, "finished_at": datetime.utcnow(), "processing_ms": processing_ms},
+                        "$unset": {"input": "", "lease_until": ""},
+                    },
+                )
+                if result.matched_count == 0:
+                    logger.warning("Job %s was requeued while running here, result discarded", job_id)
+                return
+            except Exception:
+                if attempt == FINISH_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(WORKER_BACKOFF_SECONDS * 2 ** attempt)
+
+    async def metrics(self) -> dict:
+        timings = sorted(self._processing_ms)
+        return {
+            "queue_depth": await self.broker.depth(),
+            "workers": self.workers,
+            "executor": self.executor_kind,
+            "jobs": dict(self._counts),
+            "processing_ms": {
+                "samples": len(timings),
+                "avg": sum(timings) / len(timings) if timings else None,
+                "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))] if timings else None,
+                "max": timings[-1] if timings else None,
+            },
+        }
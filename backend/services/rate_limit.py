@@ -0,0 +1,158 @@
+import asyncio
+import math
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Tuple
+
+# Requests per minute a user may spend, by role
+ROLE_LIMITS = {
+    "patient": {"capacity": 20, "refill_per_second": 20 / 60},
+    "doctor": {"capacity": 60, "refill_per_second": 60 / 60},
+    "admin": {"capacity": 120, "refill_per_second": 120 / 60},
+    "ai": {"capacity": 120, "refill_per_second": 120 / 60},
+}
+DEFAULT_ROLE_LIMIT = ROLE_LIMITS["patient"]
+
+# Tokens spent per call; image analysis is far more expensive than chat
+ENDPOINT_COSTS = {
+    "diagnosis": 2,
+    "chat": 1,
+    "chat-history": 1,
+    "amr-risk": 1,
+    "skin-analysis": 10,
+}
+DEFAULT_ENDPOINT_COST = 1
+# How often the in-memory backend drops buckets that have refilled
+EVICT_INTERVAL_SECONDS = 60.0
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+
+
+class InMemoryRateLimitBackend:
+    """
+    Token buckets held in process memory. Suitable for a single worker and
+    used as the local stand-in for the shared backend in development.
+
+    A missing bucket counts as full, so buckets are dropped once they have
+    refilled and memory tracks recently active users only.
+    """
+
+    def __init__(self):
+        # key -> (tokens, updated, time at which the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = asyncio.Lock()
+        self._evicted_at = time.monotonic()
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_second: float) -> float:
+        """Spend `cost` tokens. Returns 0 on success, otherwise seconds until enough tokens exist."""
+        async with self._lock:
+            now = time.monotonic()
+            if now - self._evicted_at > EVICT_INTERVAL_SECONDS:
+                self._evict(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_per_second)
+            return 0.0 if allowed else (cost - tokens) / refill_per_second
+
+    def _evict(self, now: float):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._evicted_at = now
+
+
+class MongoRateLimitBackend:
+    """
+    Token buckets shared by every worker through a Mongo collection. Each
+    check is a single atomic pipeline update, so no read-modify-write race.
+    Idle buckets are removed by the TTL index on updated_at (see
+    services.retention); a removed bucket is recreated full.
+    """
+
+    def __init__(self, db, collection_name: str):
+        self.db = db
+        self.collection_name = collection_name
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_per_second: float) -> float:
+        now_ms = int(time.time() * 1000)
+        refilled = {
+            "$min": [
+                capacity,
+                {
+                    "$add": [
+                        {"$ifNull": ["$tokens", capacity]},
+                        {
+                            "$multiply": [
+                                {"$subtract": [now_ms, {"$ifNull": ["$updated_ms", now_ms]}]},
+                                refill_per_second / 1000,
+                            ]
+                        },
+                    ]
+                },
+            ]
+        }
+        bucket = await self.db[self.collection_name].find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_ms": now_ms, "updated_at": datetime.utcnow()}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {
+                    "$set": {
+                        "tokens": {
+                            "$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]
+                        }
+                    }
+                },
+            ],
+            upsert=True,
+            return_document=True,  # ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (cost - bucket["tokens"]) / refill_per_second
+
+
+class RateLimiter:
+    def __init__(self, backend, role_limits=None, endpoint_costs=None):
+        self.backend = backend
+        self.role_limits = role_limits or ROLE_LIMITS
+        self.endpoint_costs = endpoint_costs or ENDPOINT_COSTS
+        self.allowed = defaultdict(int)
+        self.rejected = defaultdict(int)
+
+    async def check(self, user: dict, endpoint: str):
+        role = user.get("role", "patient")
+        limits = self.role_limits.get(role, DEFAULT_ROLE_LIMIT)
+        cost = self.endpoint_costs.get(endpoint, DEFAULT_ENDPOINT_COST)
+        key = f"{user['_id']}:{role}"
+
+        retry_after = await self.backend.consume(
+            key, cost, limits["capacity"], limits["refill_per_second"]
+        )
+        if retry_after > 0:
+            self.rejected[(endpoint, role)] += 1
+            raise RateLimitExceeded(retry_after)
+        self.allowed[(endpoint, role)] += 1
+
+    def metrics(self) -> dict:
+        return {
+            "allowed": [
+                {"endpoint": endpoint, "role": role, "count": count}
+                for (endpoint, role), count in sorted(self.allowed.items())
+            ],
+            "rejected": [
+                {"endpoint": endpoint, "role": role, "count": count}
+                for (endpoint, role), count in sorted(self.rejected.items())
+            ],
+            "total_rejected": sum(self.rejected.values()),
+        }
+
+
+def retry_after_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(retry_after)))
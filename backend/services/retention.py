@@ -0,0 +1,205 @@
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import bson
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+from services.tombstones import TOMBSTONE_EXPIRY
+
+# Archive documents must stay well below Mongo's 16MB document limit
+MAX_CHUNK_RAW_BYTES = 8 * 1024 * 1024
+# An index with this key already exists with different options
+INDEX_OPTIONS_CONFLICT = 85
+MAX_CHUNK_DOCUMENTS = 1000
+COMPRESSION_LEVEL = 6
+SCAN_BATCH_SIZE = 500
+
+
+@dataclass
+class RetentionPolicy:
+    collection: str
+    time_field: str
+    # Documents older than this are compressed into archive_<collection>
+    archive_after: Optional[timedelta] = None
+    # Transient data: Mongo's TTL monitor deletes it, nothing is archived
+    expire_after: Optional[timedelta] = None
+
+    @property
+    def archive_collection(self) -> str:
+        return f"archive_{self.collection}"
+
+
+POLICIES = [
+    RetentionPolicy("chat_messages", "timestamp", archive_after=timedelta(days=180)),
+    RetentionPolicy("ai_responses", "timestamp", archive_after=timedelta(days=180)),
+    # Images make these the largest documents we store
+    RetentionPolicy("skin_analyses", "timestamp", archive_after=timedelta(days=90)),
+    RetentionPolicy("sync_tombstones", "updated_at", expire_after=TOMBSTONE_EXPIRY),
+    # Longer than any role's bucket takes to refill, so only full buckets go
+    RetentionPolicy("rate_limits", "updated_at", expire_after=timedelta(hours=1)),
+]
+
+
+def month_bucket(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+
+async def ensure_indexes(db, policies: List[RetentionPolicy] = POLICIES):
+    """Create the retention indexes; called once from the app lifespan"""
+    for policy in policies:
+        if policy.expire_after is not None:
+            await _ensure_ttl_index(db, policy)
+        else:
+            await db[policy.collection].create_index([(policy.time_field, ASCENDING)])
+        if policy.archive_after is not None:
+            await db[policy.archive_collection].create_index(
+                [("bucket", ASCENDING), ("first", ASCENDING)]
+            )
+
+
+async def _ensure_ttl_index(db, policy: RetentionPolicy):
+    expire_after_seconds = int(policy.expire_after.total_seconds())
+    try:
+        await db[policy.collection].create_index(
+            [(policy.time_field, ASCENDING)], expireAfterSeconds=expire_after_seconds
+        )
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        # Older deployments have a plain index on the field, or a different
+        # expiry; collMod converts it in place instead of rebuilding it
+        await db.command({
+            "collMod": policy.collection,
+            "index": {"keyPattern": {policy.time_field: 1}, "expireAfterSeconds": expire_after_seconds},
+        })
+
+
+async def _storage_size(db, collection: str) -> Optional[int]:
+    try:
+        stats = await db.command("collStats", collection)
+        return stats.get("storageSize")
+    except Exception:
+        return None
+
+
+async def _write_chunk(db, policy: RetentionPolicy, bucket: str, docs: List[dict], encoded: List[bytes]):
+    raw = b"".join(encoded)
+    payload = zlib.compress(raw, COMPRESSION_LEVEL)
+    times = [doc[policy.time_field] for doc in docs]
+    # Archive first, delete second: a crash in between leaves duplicates
+    # that rehydration tolerates, never lost documents
+    await db[policy.archive_collection].insert_one({
+        "collection": policy.collection,
+        "bucket": bucket,
+        "first": min(times),
+        "last": max(times),
+        "count": len(docs),
+        "codec": "zlib",
+        "raw_bytes": len(raw),
+        "compressed_bytes": len(payload),
+        "payload": bson.Binary(payload),
+        "archived_at": datetime.utcnow(),
+    })
+    await db[policy.collection].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+    return len(raw), len(payload)
+
+
+async def archive_collection(db, policy: RetentionPolicy, now: Optional[datetime] = None) -> Dict:
+    """
+    Move documents older than the policy cutoff into compressed chunks,
+    one chunk per month bucket (split further by size). Memory stays
+    bounded by a single chunk. Rehydrated documents stay in the hot
+    collection for archive_after from when they were restored.
+    """
+    cutoff = (now or datetime.utcnow()) - policy.archive_after
+    report = {"archived": 0, "chunks": 0, "raw_bytes": 0, "compressed_bytes": 0}
+
+    bucket, docs, encoded, size = None, [], [], 0
+
+    async def flush():
+        nonlocal docs, encoded, size
+        if docs:
+            raw_bytes, compressed_bytes = await _write_chunk(db, policy, bucket, docs, encoded)
+            report["archived"] += len(docs)
+            report["chunks"] += 1
+            report["raw_bytes"] += raw_bytes
+            report["compressed_bytes"] += compressed_bytes
+        docs, encoded, size = [], [], 0
+
+    cursor = db[policy.collection].find({
+        policy.time_field: {"$lt": cutoff},
+        "$or": [{"rehydrated_at": {"$exists": False}}, {"rehydrated_at": {"$lt": cutoff}}],
+    }).sort(policy.time_field, ASCENDING).batch_size(SCAN_BATCH_SIZE)
+    async for doc in cursor:
+        doc_bucket = month_bucket(doc[policy.time_field])
+        data = bson.encode(doc)
+        if doc_bucket != bucket or size + len(data) > MAX_CHUNK_RAW_BYTES or len(docs) >= MAX_CHUNK_DOCUMENTS:
+            await flush()
+            bucket = doc_bucket
+        docs.append(doc)
+        encoded.append(data)
+        size += len(data)
+    await flush()
+
+    report["reclaimed_bytes"] = report["raw_bytes"] - report["compressed_bytes"]
+    return report
+
+
+async def run_retention(db, policies: List[RetentionPolicy] = POLICIES,
+                        now: Optional[datetime] = None) -> Dict[str, Dict]:
+    """
+    Apply every policy and report per collection what was archived and
+    reclaimed. Indexes, including the TTL ones, are created by the app at
+    startup, not here.
+    """
+    reports = {}
+    for policy in policies:
+        if policy.archive_after is None:
+            reports[policy.collection] = {"ttl_seconds": int(policy.expire_after.total_seconds())}
+            continue
+        before = await _storage_size(db, policy.collection)
+        report = await archive_collection(db, policy, now)
+        # storageSize only shrinks after compaction, so this is informational
+        report["storage_size_before"] = before
+        report["storage_size_after"] = await _storage_size(db, policy.collection)
+        reports[policy.collection] = report
+    return reports
+
+
+async def rehydrate(db, policy: RetentionPolicy, start: datetime, end: datetime,
+                    remove_from_archive: bool = False) -> int:
+    """
+    Restore archived documents with time_field in [start, end) into the
+    hot collection. Already present documents are skipped, so repeating a
+    rehydration is harmless. Restored documents are stamped with
+    rehydrated_at so the next archive run leaves them alone. Returns the
+    number of documents restored.
+    """
+    restored = 0
+    rehydrated_at = datetime.utcnow()
+    cursor = db[policy.archive_collection].find(
+        {"collection": policy.collection, "first": {"$lt": end}, "last": {"$gte": start}}
+    )
+    async for chunk in cursor:
+        docs = [
+            {**doc, "rehydrated_at": rehydrated_at}
+            for doc in bson.decode_all(zlib.decompress(chunk["payload"]))
+            if start <= doc[policy.time_field] < end
+        ]
+        if docs:
+            try:
+                result = await db[policy.collection].insert_many(docs, ordered=False)
+                restored += len(result.inserted_ids)
+            except BulkWriteError as e:
+                restored += e.details.get("nInserted", 0)
+        if remove_from_archive and len(docs) == chunk["count"]:
+            await db[policy.archive_collection].delete_one({"_id": chunk["_id"]})
+    return restored
+
+
+def get_policy(collection: str, policies: List[RetentionPolicy] = POLICIES) -> RetentionPolicy:
+    for policy in policies:
+        if policy.collection == collection and policy.archive_after is not None:
+            return policy
+    raise KeyError(f"No archive policy for {collection}")
@@ -0,0 +1,46 @@
+import base64
+import io
+
+RECOMMENDATION = """Based on the analysis, this appears to be eczema with mild severity. 
+
+**Recommendations:**
+• Apply moisturizer regularly
+• Use mild, fragrance-free soap
+• Avoid known triggers
+• Consider topical corticosteroid if symptoms persist
+
+**When to see a doctor:**
+• Symptoms worsen or don't improve in 1-2 weeks
+• Signs of infection (pus, increased redness, warmth)
+• Severe itching affecting sleep"""
+
+
+def analyze_image(image_data: bytes) -> dict:
+    """
+    CPU-bound part of a skin analysis: decode, re-encode and run the model.
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    # Convert to base64 for storage
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    image_base64 = base64.b64encode(buffered.getvalue()).decode()
+
+    # Mock AI analysis (in real implementation, this would call a trained model)
+    predictions = [
+        {"condition": "Eczema", "probability": 0.85, "severity": "mild"},
+        {"condition": "Dermatitis", "probability": 0.12, "severity": "mild"},
+        {"condition": "Normal skin", "probability": 0.03, "severity": "none"}
+    ]
+
+    return {
+        "image_base64": image_base64,
+        "predictions": predictions,
+        "confidence": 0.85,
+        "recommendation": RECOMMENDATION,
+    }
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+# Offline clients learn about hard deletes from these records, so every
+# path that deletes a synced document has to leave one behind.
+
+# Tombstones are removed by a TTL index after this long (services.retention);
+# a client that hasn't synced for longer may have missed deletions
+TOMBSTONE_EXPIRY = timedelta(days=90)
+
+
+async def write_tombstone(db, collection: str, document: dict, now: Optional[datetime] = None):
+    await write_tombstones(db, collection, [document], now)
+
+
+async def write_tombstones(db, collection: str, documents: List[dict], now: Optional[datetime] = None):
+    if not documents:
+        return
+    now = now or datetime.utcnow()
+    await db.sync_tombstones.insert_many([
+        {
+            "collection": collection,
+            "id": str(document["_id"]),
+            "client_id": document.get("client_id"),
+            "updated_at": now,
+        }
+        for document in documents
+    ])